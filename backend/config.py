@@ -32,6 +32,89 @@ ENVATO_PASSWORD = os.getenv("ENVATO_PASSWORD")
 
 # Google Drive Configuration
 DRIVE_FOLDER_ID = os.getenv("DRIVE_FOLDER_ID")
+# Tempo (segundos) que os metadados da pasta do Drive ficam em cache
+DRIVE_FOLDER_CACHE_TTL = int(os.getenv("DRIVE_FOLDER_CACHE_TTL", "600"))
+# Tamanho (MB) de cada chunk do upload resumable
+DRIVE_UPLOAD_CHUNK_MB = int(os.getenv("DRIVE_UPLOAD_CHUNK_MB", "8"))
+# Não reenvia arquivos cujo conteúdo (MD5) já existe na pasta do Drive
+DRIVE_DEDUPE = os.getenv("DRIVE_DEDUPE", "true").lower() not in ("0", "false", "no")
+# Segundos até recarregar a lista de arquivos da pasta usada na deduplicação
+DRIVE_HASH_INDEX_TTL = int(os.getenv("DRIVE_HASH_INDEX_TTL", "3600"))
+# Endpoint alternativo da API do Drive (apenas para testes com servidor local)
+DRIVE_API_ENDPOINT = os.getenv("DRIVE_API_ENDPOINT") or None
 
 # Download Path
 DOWNLOAD_PATH = os.path.join(os.getcwd(), "downloads")
+
+# Dados locais persistidos entre execuções (sessões, caches, índices)
+DATA_PATH = os.getenv("DATA_PATH", os.path.join(os.getcwd(), "data"))
+
+# Sessões autenticadas do Freepik/Envato (contém cookies, NÃO comitar)
+SESSION_PATH = os.path.join(DATA_PATH, "sessions")
+# Por quanto tempo (s) um teste de login bem-sucedido é reaproveitado
+LOGIN_CHECK_TTL = int(os.getenv("LOGIN_CHECK_TTL", "600"))
+
+# Histórico de acertos dos seletores do botão de download
+SELECTOR_STATS_PATH = os.path.join(DATA_PATH, "selector_stats.json")
+
+# Métricas por etapa: porta do endpoint Prometheus local (0 = desligado) e
+# arquivo com uma linha JSON por etapa (vazio = desligado)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_JSON_LOG_PATH = os.getenv("METRICS_JSON_LOG_PATH", "")
+
+# Fila persistente de jobs (SQLite) usada pela GUI e pelo bot
+JOB_STORE_PATH = os.path.join(DATA_PATH, "jobs.db")
+# Dias em que jobs concluídos ou falhos ficam no histórico antes de serem apagados
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# file_id dos arquivos já enviados pelo Telegram (reenvio sem novo upload)
+TELEGRAM_FILE_CACHE_PATH = os.path.join(DATA_PATH, "telegram_files.json")
+
+# Link e MD5 dos arquivos transmitidos direto ao Drive (pedidos repetidos não baixam de novo)
+DRIVE_LINK_CACHE_PATH = os.path.join(DATA_PATH, "drive_links.json")
+
+# Envia ao Drive enquanto o download ainda está em andamento (arquivos grandes)
+STREAM_UPLOADS = os.getenv("STREAM_UPLOADS", "true").lower() not in ("0", "false", "no")
+# Tamanho mínimo (MB) para transmitir direto ao Drive e memória máxima (MB) do buffer
+STREAM_UPLOAD_MIN_MB = int(os.getenv("STREAM_UPLOAD_MIN_MB", "20"))
+STREAM_BUFFER_MB = int(os.getenv("STREAM_BUFFER_MB", "32"))
+
+# Diário dos uploads resumable do Drive (permite retomar após reinício)
+DRIVE_UPLOAD_JOURNAL_PATH = os.path.join(DATA_PATH, "drive_uploads.json")
+
+# Cache local de downloads (assets repetidos não passam pelo navegador)
+# Limite em MB; 0 desativa o cache
+DOWNLOAD_CACHE_PATH = os.path.join(DATA_PATH, "cache")
+DOWNLOAD_CACHE_MB = int(os.getenv("DOWNLOAD_CACHE_MB", "2048"))
+
+# Browser Pool
+# Quantidade de navegadores Chromium mantidos abertos e reaproveitados entre os downloads
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() not in ("0", "false", "no")
+
+# Bloqueio de requisições desnecessárias (imagens, fontes, mídia e rastreadores)
+BLOCK_REQUESTS = os.getenv("BLOCK_REQUESTS", "true").lower() not in ("0", "false", "no")
+BLOCKED_RESOURCE_TYPES = [t.strip() for t in os.getenv("BLOCKED_RESOURCE_TYPES", "image,font,media").split(",") if t.strip()]
+
+# Execução concorrente de jobs
+# Máximo de links processados ao mesmo tempo e limites por provedor/etapa
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "8"))
+FREEPIK_CONCURRENCY = int(os.getenv("FREEPIK_CONCURRENCY", "3"))
+ENVATO_CONCURRENCY = int(os.getenv("ENVATO_CONCURRENCY", "2"))
+DRIVE_UPLOAD_CONCURRENCY = int(os.getenv("DRIVE_UPLOAD_CONCURRENCY", "2"))
+# Jobs da GUI em andamento ao mesmo tempo e tempo máximo (s) para concluí-los ao fechar
+GUI_MAX_IN_FLIGHT = int(os.getenv("GUI_MAX_IN_FLIGHT", "4"))
+GUI_DRAIN_TIMEOUT = int(os.getenv("GUI_DRAIN_TIMEOUT", "30"))
+# Console de logs da GUI: linhas mantidas e nível mínimo exibido (DEBUG, INFO, SUCCESS, WARNING, ERROR)
+GUI_LOG_MAX_LINES = int(os.getenv("GUI_LOG_MAX_LINES", "5000"))
+GUI_LOG_LEVEL = os.getenv("GUI_LOG_LEVEL", "INFO").upper()
+# Workers do bot que consomem a fila de links e tamanho máximo da fila
+TELEGRAM_WORKERS = int(os.getenv("TELEGRAM_WORKERS", str(MAX_CONCURRENT_JOBS)))
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "100"))
+
+# Transferência direta (HTTP) dos arquivos após o navegador resolver a URL real
+DIRECT_TRANSFER = os.getenv("DIRECT_TRANSFER", "true").lower() not in ("0", "false", "no")
+# Arquivos a partir deste tamanho (MB) são baixados em segmentos paralelos
+TRANSFER_SEGMENTS = int(os.getenv("TRANSFER_SEGMENTS", "4"))
+TRANSFER_SEGMENT_MIN_MB = int(os.getenv("TRANSFER_SEGMENT_MIN_MB", "32"))
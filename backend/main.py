@@ -1,13 +1,33 @@
 import asyncio
 import logging
 import os
+import time
 from .config import (
     TELEGRAM_TOKEN, FREEPIK_EMAIL, FREEPIK_PASSWORD,
-    ENVATO_EMAIL, ENVATO_PASSWORD, DRIVE_FOLDER_ID, DOWNLOAD_PATH
+    ENVATO_EMAIL, ENVATO_PASSWORD, DRIVE_FOLDER_ID, DRIVE_FOLDER_CACHE_TTL, DOWNLOAD_PATH,
+    DRIVE_UPLOAD_CHUNK_MB, DRIVE_UPLOAD_JOURNAL_PATH, DRIVE_API_ENDPOINT,
+    DRIVE_DEDUPE, DRIVE_HASH_INDEX_TTL,
+    BROWSER_POOL_SIZE, BROWSER_HEADLESS, SESSION_PATH, SELECTOR_STATS_PATH,
+    BLOCK_REQUESTS, BLOCKED_RESOURCE_TYPES,
+    MAX_CONCURRENT_JOBS, FREEPIK_CONCURRENCY, ENVATO_CONCURRENCY, DRIVE_UPLOAD_CONCURRENCY,
+    DIRECT_TRANSFER, TRANSFER_SEGMENTS, TRANSFER_SEGMENT_MIN_MB,
+    DOWNLOAD_CACHE_PATH, DOWNLOAD_CACHE_MB,
+    STREAM_UPLOADS, STREAM_UPLOAD_MIN_MB, STREAM_BUFFER_MB,
+    TELEGRAM_FILE_CACHE_PATH, DRIVE_LINK_CACHE_PATH, TELEGRAM_WORKERS, TELEGRAM_QUEUE_SIZE,
+    JOB_STORE_PATH, JOB_RETENTION_DAYS,
+    LOGIN_CHECK_TTL, METRICS_PORT, METRICS_HOST, METRICS_JSON_LOG_PATH
 )
-from .modules.bot import TelegramBot
 from .modules.downloader import Downloader
 from .modules.drive_service import DriveService
+from .modules.job_executor import JobExecutor
+from .modules.job_store import JobStore
+from .modules.transfer import TransferEngine
+from .modules.download_cache import DownloadCache
+from .modules.asset_url import canonical_asset_key
+from .modules.singleflight import SingleFlight
+from .modules.telegram_file_cache import TelegramFileCache
+from .modules.drive_link_cache import DriveLinkCache
+from .modules.metrics import metrics
 
 # Configuração de logs
 logging.basicConfig(
@@ -21,7 +41,20 @@ class AutomationApp:
         self.downloader = Downloader(
             freepik_creds={'email': FREEPIK_EMAIL, 'password': FREEPIK_PASSWORD},
             envato_creds={'email': ENVATO_EMAIL, 'password': ENVATO_PASSWORD},
-            download_path=DOWNLOAD_PATH
+            download_path=DOWNLOAD_PATH,
+            browser_pool_size=BROWSER_POOL_SIZE,
+            headless=BROWSER_HEADLESS,
+            session_path=SESSION_PATH,
+            selector_stats_path=SELECTOR_STATS_PATH,
+            block_requests=BLOCK_REQUESTS,
+            blocked_resource_types=BLOCKED_RESOURCE_TYPES,
+            transfer_engine=TransferEngine(
+                segments=TRANSFER_SEGMENTS,
+                segment_min_size=TRANSFER_SEGMENT_MIN_MB * 1024 * 1024
+            ) if DIRECT_TRANSFER else None,
+            download_cache=DownloadCache(
+                DOWNLOAD_CACHE_PATH, DOWNLOAD_CACHE_MB * 1024 * 1024
+            ) if DOWNLOAD_CACHE_MB > 0 else None
         )
         
         # Inicializa o Drive Service
@@ -30,9 +63,179 @@ class AutomationApp:
         credentials_path = os.path.join(project_root, 'credentials.json')
         self.drive_service = DriveService(
             credentials_path=credentials_path,
-            folder_id=DRIVE_FOLDER_ID
+            folder_id=DRIVE_FOLDER_ID,
+            upload_parallelism=DRIVE_UPLOAD_CONCURRENCY,
+            folder_cache_ttl=DRIVE_FOLDER_CACHE_TTL,
+            chunk_size=DRIVE_UPLOAD_CHUNK_MB * 1024 * 1024,
+            journal_path=DRIVE_UPLOAD_JOURNAL_PATH,
+            api_endpoint=DRIVE_API_ENDPOINT,
+            dedupe=DRIVE_DEDUPE,
+            hash_index_ttl=DRIVE_HASH_INDEX_TTL
         )
 
+        # Executor de jobs concorrentes, com limites por provedor e para o Drive
+        self.executor = JobExecutor(
+            max_jobs=MAX_CONCURRENT_JOBS,
+            limits={
+                'freepik': FREEPIK_CONCURRENCY,
+                'envato': ENVATO_CONCURRENCY,
+                'drive': DRIVE_UPLOAD_CONCURRENCY,
+            }
+        )
+
+        # Pedidos simultâneos do mesmo asset são atendidos por um único download/upload
+        self.singleflight = SingleFlight()
+
+        # file_id dos arquivos já enviados pelo Telegram, para reenvio instantâneo
+        self.telegram_files = TelegramFileCache(TELEGRAM_FILE_CACHE_PATH)
+
+        # Link dos arquivos transmitidos ao Drive, que não passam pelo cache local
+        self.drive_links = DriveLinkCache(DRIVE_LINK_CACHE_PATH)
+
+        # Resultado dos testes de login: nome -> (instante, resultado)
+        self._login_checks = {}
+
+        # Métricas por etapa: endpoint Prometheus local e log JSON (opcionais)
+        if METRICS_JSON_LOG_PATH:
+            try:
+                metrics.enable_json_log(METRICS_JSON_LOG_PATH)
+            except OSError as e:
+                logging.warning(f"Não foi possível abrir o log de métricas: {e}")
+        if METRICS_PORT:
+            try:
+                metrics.serve(METRICS_PORT, METRICS_HOST)
+            except OSError as e:
+                logging.warning(f"Não foi possível abrir o endpoint de métricas na porta {METRICS_PORT}: {e}")
+
+    async def submit_job(self, url, telegram_message=None):
+        """
+        Enfileira um link no executor e aguarda o resultado.
+        Vários links submetidos ao mesmo tempo são processados em paralelo.
+        """
+        return await self.executor.submit(self.process_download_and_upload, url, telegram_message)
+
+    @staticmethod
+    def _share_download(result, count):
+        """
+        Uma cópia do arquivo baixado para cada requisição que aguardava o mesmo
+        asset; um link do Drive (download transmitido) é apenas repetido.
+        """
+        file_path, drive_link = result
+        if not file_path or drive_link:
+            return [result] * count
+        return [result] + [(Downloader.duplicate_file(file_path), None) for _ in range(count - 1)]
+
+    async def _download(self, url, stream_min_size=None):
+        """
+        Baixa o asset; pedidos simultâneos do mesmo asset compartilham o download.
+
+        Com `stream_min_size`, arquivos a partir desse tamanho são enviados ao Drive
+        enquanto ainda estão sendo baixados, sem passar pelo disco. O limite vale
+        para o download compartilhado (o do primeiro pedido): cada pedido decide o
+        que fazer com o resultado depois que ele chega (Telegram ou Drive, pelo
+        tamanho do arquivo, ou só repassar o link).
+        Um asset já enviado ao Drive é respondido com o link existente, sem baixar.
+        Retorna (caminho_local, None), (None, link_do_drive) ou (None, None).
+        """
+        asset_key = canonical_asset_key(url)
+
+        async def fetch():
+            if self._drive_available():
+                with metrics.stage('drive_link_cache') as stage:
+                    drive_link = await self._cached_drive_link(asset_key)
+                    stage.outcome = 'hit' if drive_link else 'miss'
+                if drive_link:
+                    return (None, drive_link)
+
+            uploads = []
+
+            async def open_stream(file_name, total):
+                if stream_min_size is None or total < stream_min_size:
+                    return None
+                logging.info(f"Enviando {file_name} ({total / 1024 / 1024:.2f}MB) ao Drive durante o download")
+                # Mesma vaga de upload do Drive que _upload_to_drive, ocupada até o envio terminar
+                release = await self.executor.acquire('drive')
+                try:
+                    stream, upload = await self.drive_service.open_stream(
+                        file_name, total, buffer_size=STREAM_BUFFER_MB * 1024 * 1024
+                    )
+                except BaseException:
+                    release()
+                    raise
+                upload.add_done_callback(lambda _: release())
+                uploads.append((stream, upload, file_name))
+                return stream
+
+            async with self.executor.limit(self.downloader.get_provider(url)):
+                file_path = await self.downloader.download_file(url, open_stream=open_stream)
+
+            if file_path and os.path.exists(file_path):
+                return (file_path, None)
+            if file_path and uploads:
+                # O upload acompanhou o download: só falta a confirmação do último chunk
+                stream, upload, file_name = uploads[-1]
+                drive_link = await upload
+                self.drive_links.put(asset_key, drive_link, stream.md5, file_name)
+                return (None, drive_link)
+            return (None, None)
+
+        # Só o asset na chave: pedidos com limites de streaming diferentes (GUI e
+        # Telegram) também compartilham o mesmo download
+        key = ('download', asset_key)
+        return await self.singleflight.do(key, fetch, share=self._share_download)
+
+    async def _cached_drive_link(self, asset_key):
+        """Link do arquivo já transmitido ao Drive para o asset, se ainda estiver na pasta"""
+        entry = self.drive_links.get(asset_key)
+        if not entry:
+            return None
+        try:
+            drive_link = await self.drive_service.find_existing_async(entry['md5'])
+        except Exception as e:
+            logging.warning(f"Erro ao conferir arquivo já enviado ao Drive: {e}")
+            return None
+        if not drive_link:
+            # Removido da pasta (ou deduplicação desligada): baixa e envia de novo
+            self.drive_links.invalidate(asset_key)
+            return None
+        logging.info(f"Asset já enviado ao Drive, reaproveitando o link: {asset_key}")
+        return drive_link
+
+    async def _send_cached_document(self, url, telegram_message):
+        """Responde com o file_id já conhecido do asset; retorna o file_id ou None"""
+        asset_key = canonical_asset_key(url)
+        file_id = self.telegram_files.get(asset_key)
+        if not file_id:
+            return None
+        from telegram.error import BadRequest
+        try:
+            await telegram_message.reply_document(document=file_id)
+        except BadRequest as e:
+            # file_id não é mais aceito pelo Telegram: descarta e baixa de novo
+            logging.warning(f"file_id em cache recusado pelo Telegram ({e}), baixando novamente")
+            self.telegram_files.invalidate(asset_key)
+            return None
+        except Exception as e:
+            logging.warning(f"Erro ao reenviar arquivo em cache pelo Telegram: {e}")
+            return None
+        logging.info(f"Arquivo reenviado pelo Telegram a partir do cache: {asset_key}")
+        return file_id
+
+    def _drive_available(self):
+        return bool(self.drive_service and self.drive_service.service and DRIVE_FOLDER_ID)
+
+    async def _upload_to_drive(self, url, file_path):
+        """Faz o upload para o Drive; pedidos simultâneos do mesmo asset recebem o mesmo link"""
+        async def upload():
+            async with self.executor.limit('drive'):
+                # Upload em thread separada: o event loop continua atendendo o bot
+                # MD5 calculado durante o download (deduplicação sem reler o arquivo)
+                md5 = self.downloader.checksums.lookup(file_path)
+                return await self.drive_service.upload_file_async(file_path, md5)
+
+        key = ('drive', canonical_asset_key(url))
+        return await self.singleflight.do(key, upload)
+
     async def process_download_and_upload(self, url, telegram_message=None):
         """
         Esta função é o callback que o bot chama quando recebe um link.
@@ -45,18 +248,53 @@ class AutomationApp:
         3. Se não tem telegram_message (GUI desktop):
            - Faz upload para Google Drive e retorna o link
            - Se não tem Google Drive configurado, salva localmente
+
+        Cada etapa é medida (backend.modules.metrics) sob um ID de job próprio.
         """
+        with metrics.job(self.downloader.get_provider(url) or 'unknown') as job:
+            result = await self._process(url, telegram_message)
+            if not result:
+                job.outcome = 'failed'
+            return result
+
+    async def _process(self, url, telegram_message):
         try:
+            # Telegram tem limite de 20MB para bots
+            telegram_max_size = 20 * 1024 * 1024  # 20MB em bytes
+
+            # Arquivos grandes que iriam para o Drive de qualquer jeito são enviados
+            # enquanto ainda estão sendo baixados (latência ~ max(download, upload))
+            stream_min_size = None
+            if STREAM_UPLOADS and self._drive_available():
+                stream_min_size = STREAM_UPLOAD_MIN_MB * 1024 * 1024
+                if telegram_message:
+                    stream_min_size = max(stream_min_size, telegram_max_size + 1)
+
+            # Asset já enviado antes pelo Telegram: reenvia o mesmo file_id, sem baixar nada
+            if telegram_message:
+                with metrics.stage('telegram_cached_send') as stage:
+                    sent = await self._send_cached_document(url, telegram_message)
+                    stage.outcome = 'hit' if sent else 'miss'
+                if sent:
+                    return sent
+
             # 1. Faz o download do arquivo
-            file_path = await self.downloader.download_file(url)
+            with metrics.stage('download', provider=self.downloader.get_provider(url)) as stage:
+                file_path, drive_link = await self._download(url, stream_min_size)
+                if not file_path and not drive_link:
+                    stage.outcome = 'failed'
+
+            if drive_link:
+                if telegram_message:
+                    await telegram_message.reply_text(f"📎 Arquivo disponível no Google Drive:\n{drive_link}")
+                return drive_link
             
             if not file_path:
                 logging.error(f"Falha ao baixar o arquivo da URL: {url}")
                 return None
             
-            # Verifica o tamanho do arquivo (Telegram tem limite de 20MB para bots)
+            # Verifica o tamanho do arquivo
             file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-            telegram_max_size = 20 * 1024 * 1024  # 20MB em bytes
             
             # 2. Se temos acesso à mensagem do Telegram, tenta enviar diretamente
             if telegram_message:
@@ -66,9 +304,16 @@ class AutomationApp:
                 else:
                     try:
                         # Tenta enviar o arquivo diretamente pelo Telegram
-                        with open(file_path, 'rb') as file:
-                            await telegram_message.reply_document(document=file)
+                        with metrics.stage('telegram_send'), open(file_path, 'rb') as file:
+                            sent_message = await telegram_message.reply_document(document=file)
+                        metrics.inc('bytes_total', file_size, direction='upload', provider='telegram')
                         logging.info(f"Arquivo enviado pelo Telegram: {file_path}")
+
+                        # Guarda o file_id para reenviar o mesmo arquivo sem novo upload
+                        if sent_message and sent_message.document:
+                            self.telegram_files.put(
+                                canonical_asset_key(url), sent_message.document.file_id, os.path.basename(file_path)
+                            )
                         
                         # Remove o arquivo local após enviar
                         if os.path.exists(file_path):
@@ -82,8 +327,11 @@ class AutomationApp:
                         # Se falhar, continua para fazer upload no Drive
             
             # 3. Faz o upload para o Google Drive (fallback ou quando não tem telegram_message)
-            if self.drive_service and self.drive_service.service and DRIVE_FOLDER_ID:
-                drive_link = self.drive_service.upload_file(file_path)
+            if self._drive_available():
+                with metrics.stage('drive_upload') as stage:
+                    drive_link = await self._upload_to_drive(url, file_path)
+                    if not drive_link:
+                        stage.outcome = 'failed'
                 
                 if drive_link:
                     # Remove o arquivo local após upload bem-sucedido
@@ -115,51 +363,110 @@ class AutomationApp:
                 await telegram_message.reply_text("❌ Erro técnico ao processar o arquivo. Tente novamente mais tarde.")
             return None
 
-    async def test_logins(self):
-        """Testa os logins do Freepik, Envato e Google Drive"""
-        results = {
-            'freepik': None,
-            'envato': None,
-            'google_drive': None
+    async def test_logins(self, force=False):
+        """
+        Testa os logins do Freepik, Envato e Google Drive ao mesmo tempo.
+
+        Resultados positivos ficam em cache por LOGIN_CHECK_TTL segundos (`force`
+        ignora o cache); chamadas simultâneas compartilham a mesma verificação.
+        """
+        checks = {
+            'freepik': self._check_freepik if FREEPIK_EMAIL and FREEPIK_PASSWORD else None,
+            'envato': self._check_envato if ENVATO_EMAIL and ENVATO_PASSWORD else None,
+            'google_drive': self._check_drive if self.drive_service else None,
         }
-        
-        # Testar Freepik
-        if FREEPIK_EMAIL and FREEPIK_PASSWORD:
-            try:
-                results['freepik'] = await self.downloader.test_freepik_login()
-            except Exception as e:
-                logging.error(f"Erro ao testar login do Freepik: {e}")
-                results['freepik'] = False
-        else:
-            results['freepik'] = None  # Não configurado
-        
-        # Testar Envato
-        if ENVATO_EMAIL and ENVATO_PASSWORD:
-            try:
-                results['envato'] = await self.downloader.test_envato_login()
-            except Exception as e:
-                logging.error(f"Erro ao testar login do Envato: {e}")
-                results['envato'] = False
-        else:
-            results['envato'] = None  # Não configurado
-        
-        # Testar Google Drive
-        if self.drive_service:
+        names = list(checks)
+        results = await asyncio.gather(*(self._cached_check(name, checks[name], force) for name in names))
+        return dict(zip(names, results))
+
+    async def _cached_check(self, name, check, force):
+        if check is None:
+            return None  # Não configurado
+        cached = self._login_checks.get(name)
+        if not force and cached and time.monotonic() - cached[0] < LOGIN_CHECK_TTL:
+            return cached[1]
+
+        async def run():
             try:
-                results['google_drive'] = self.drive_service.test_connection()
+                return await check()
             except Exception as e:
-                logging.error(f"Erro ao testar conexão do Google Drive: {e}")
-                results['google_drive'] = False
+                logging.error(f"Erro ao testar {name}: {e}")
+                return False
+
+        result = await self.singleflight.do(('login_check', name), run)
+        # Falhas não ficam em cache: o próximo teste tenta de novo
+        if result:
+            self._login_checks[name] = (time.monotonic(), result)
         else:
-            results['google_drive'] = None  # Não configurado
-        
-        return results
+            self._login_checks.pop(name, None)
+        return result
+
+    async def _check_freepik(self):
+        return await self.downloader.test_freepik_login()
+
+    async def _check_envato(self):
+        return await self.downloader.test_envato_login()
+
+    async def _check_drive(self):
+        # A API do Drive é síncrona: roda fora do event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.drive_service.test_connection)
     
+    async def shutdown(self, drain_timeout=30):
+        """
+        Libera os recursos de longa duração (jobs em andamento, navegadores e uploads).
+        Espera até `drain_timeout` segundos pelos jobs em andamento antes de cancelá-los.
+        """
+        try:
+            await self.executor.shutdown(timeout=drain_timeout)
+        except Exception as e:
+            logging.error(f"Erro ao encerrar o executor de jobs: {e}")
+        stats = self.singleflight.stats
+        if stats['coalesced']:
+            logging.info(
+                f"Requisições agrupadas: {stats['coalesced']} de {stats['calls']} "
+                f"({stats['executions']} execuções reais)"
+            )
+        stats = self.telegram_files.stats
+        if stats['hits']:
+            logging.info(
+                f"Arquivos reenviados pelo file_id do Telegram: {stats['hits']} "
+                f"({stats['invalidated']} file_id(s) recusados)"
+            )
+        stats = self.drive_links.stats
+        if stats['hits']:
+            logging.info(
+                f"Assets respondidos com o link já enviado ao Drive: {stats['hits']} "
+                f"({stats['invalidated']} não estavam mais na pasta)"
+            )
+        try:
+            await self.downloader.close()
+        except Exception as e:
+            logging.error(f"Erro ao encerrar o Downloader: {e}")
+        stats = self.drive_service.stats
+        if stats['uploads'] or stats['deduplicated']:
+            logging.info(
+                f"Drive: {stats['uploads']} upload(s), {stats['deduplicated']} reaproveitado(s) "
+                f"por conteúdo idêntico, {stats['api_calls']} chamada(s) à API"
+            )
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.drive_service.close)
+        except Exception as e:
+            logging.error(f"Erro ao encerrar o Drive Service: {e}")
+        metrics.close()
+
     def run(self):
+        # Importado só aqui: a GUI usa o AutomationApp sem carregar o python-telegram-bot
+        from .modules.bot import TelegramBot
+
         # Inicializa o Bot do Telegram com o callback de processamento
+        # O shutdown roda no mesmo event loop do bot, ao encerrar o polling
         bot = TelegramBot(
             token=TELEGRAM_TOKEN,
-            download_callback=self.process_download_and_upload
+            download_callback=self.submit_job,
+            shutdown_callback=self.shutdown,
+            workers=TELEGRAM_WORKERS,
+            queue_size=TELEGRAM_QUEUE_SIZE,
+            job_store=JobStore(JOB_STORE_PATH, retention_seconds=JOB_RETENTION_DAYS * 24 * 3600)
         )
         bot.run()
 
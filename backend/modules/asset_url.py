@@ -0,0 +1,129 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+# Candidatos a link dentro de um texto livre (mensagem do Telegram, campo da GUI):
+# para em espaços, aspas e sinais de maior/menor. O provedor é verificado depois,
+# no parse (com cache), o que mantém a regex simples e rápida.
+LINK_RE = re.compile(r'https?://[^\s<>"\']+', re.IGNORECASE)
+# Pontuação que costuma vir colada no fim do link em mensagens
+TRAILING_PUNCTUATION = '.,;:!?)]}'
+
+# Freepik: .../nome-do-recurso_12345678.htm ou ..._23-2149012345.htm (ID antes de .htm)
+FREEPIK_ID_RE = re.compile(r'_(\d+(?:-\d+)?)\.htm$')
+# Envato Elements: .../nome-do-item-ABCD123 (o ID é o último trecho, em maiúsculas)
+ENVATO_ID_RE = re.compile(r'-([A-Z0-9]{5,})$')
+# Prefixo de idioma nas URLs do Envato (/pt-br/, /es/, ...)
+ENVATO_LOCALE_RE = re.compile(r'^/[a-z]{2}(?:-[a-z]{2})?(?=/)')
+# Trechos do caminho das páginas de login dos provedores (/login, /v2/log-in, /sign_in...)
+LOGIN_PATHS = frozenset({'login', 'log-in', 'signin', 'sign-in', 'sign_in'})
+# Hosts que só servem o login (SSO): qualquer página deles é de login
+LOGIN_HOSTS = frozenset({'id.freepik.com'})
+
+AssetRef = namedtuple('AssetRef', ['provider', 'asset_id', 'url'])
+
+
+def _provider_for_host(host):
+    if host == 'freepik.com' or host.endswith('.freepik.com'):
+        return 'freepik'
+    if host == 'elements.envato.com':
+        return 'envato'
+    return None
+
+
+@lru_cache(maxsize=16384)
+def parse_asset_url(url):
+    """
+    Identifica o provedor e o ID do asset a partir da URL.
+
+    Retorna AssetRef(provider, asset_id, url) ou None se a URL não for de um
+    provedor suportado. `url` é a forma canônica para navegação: sem query
+    string (parâmetros de rastreamento) nem fragmento. Quando o caminho não tem
+    um ID reconhecível, o próprio caminho (sem prefixo de idioma) faz o papel de ID.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return None
+    provider = _provider_for_host(host)
+    if provider is None:
+        return None
+
+    path = parts.path.rstrip('/')
+    match = (FREEPIK_ID_RE if provider == 'freepik' else ENVATO_ID_RE).search(path)
+    if match:
+        asset_id = match.group(1)
+    else:
+        if provider == 'envato':
+            path = ENVATO_LOCALE_RE.sub('', path)
+        asset_id = path.lower() or '/'
+
+    netloc = host if parts.port is None else f"{host}:{parts.port}"
+    canonical = urlunsplit((parts.scheme.lower(), netloc, parts.path, '', ''))
+    return AssetRef(provider, asset_id, canonical)
+
+
+def get_provider(url):
+    """'freepik', 'envato' ou None"""
+    ref = parse_asset_url(url)
+    return ref.provider if ref else None
+
+
+def is_login_url(url):
+    """
+    True se a URL é uma página de login de um provedor: o host de SSO ou um
+    trecho do caminho igual a "login", "log-in", "sign-in"... Compara trechos
+    inteiros, para não confundir com assets cujo nome contém "login".
+    """
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return False
+    if host in LOGIN_HOSTS:
+        return True
+    if not (host == 'freepik.com' or host.endswith(('.freepik.com', '.envato.com'))):
+        return False
+    return any(segment in LOGIN_PATHS for segment in parts.path.lower().split('/'))
+
+
+def canonical_asset_key(url):
+    """
+    Chave estável do asset ('provedor:ID'), igual para todas as variantes da
+    mesma URL (idioma, parâmetros de rastreamento, fragmento, "www.").
+    """
+    ref = parse_asset_url(url)
+    if ref is None:
+        try:
+            parts = urlsplit(url.strip())
+            host = (parts.hostname or '').lower()
+        except ValueError:
+            # URL malformada (ex.: "https://[::1"): usa o próprio texto como chave
+            return url.strip().lower()
+        return f"{host}{parts.path.rstrip('/')}"
+    return f"{ref.provider}:{ref.asset_id}"
+
+
+def find_asset_links(text):
+    """
+    Extrai os links suportados de um texto, na ordem em que aparecem e sem
+    repetir o mesmo asset. Retorna a URL canônica de cada um.
+    """
+    links = []
+    seen = set()
+    for candidate in LINK_RE.findall(text):
+        ref = _parse_candidate(candidate)
+        if ref is None:
+            continue
+        key = (ref.provider, ref.asset_id)
+        if key not in seen:
+            seen.add(key)
+            links.append(ref.url)
+    return links
+
+
+@lru_cache(maxsize=16384)
+def _parse_candidate(candidate):
+    return parse_asset_url(candidate.rstrip(TRAILING_PUNCTUATION))
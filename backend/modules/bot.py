@@ -1,7 +1,13 @@
+import asyncio
 import logging
-import re
-from telegram import Update
+import os
+import uuid
+from telegram import Message, Update
 from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
+from .asset_url import find_asset_links
+from .job_store import JobStore
+
+JOB_QUEUE = 'telegram'
 
 # Configuração de logging
 logging.basicConfig(
@@ -10,48 +16,145 @@ logging.basicConfig(
 )
 
 class TelegramBot:
-    def __init__(self, token, download_callback):
+    def __init__(self, token, download_callback, shutdown_callback=None, workers=8, queue_size=100,
+                 job_store=None):
         self.token = token
         self.download_callback = download_callback
-        self.app = ApplicationBuilder().token(self.token).build()
+        self.shutdown_callback = shutdown_callback
+
+        # O handler só identifica os links e os coloca na fila; os workers fazem o
+        # trabalho pesado. Com concurrent_updates, um job lento não trava os outros chats.
+        # A fila é persistente: links pendentes sobrevivem a quedas e reinícios.
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.job_store = job_store or JobStore(':memory:')
+        self.worker_id = f"bot-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wakeup = None
+        self._worker_tasks = []
+        self._busy_workers = 0
+        self.app = (
+            ApplicationBuilder()
+            .token(self.token)
+            .concurrent_updates(True)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+
+    async def _post_init(self, application):
+        # Jobs que estavam em andamento quando o processo anterior caiu voltam para a fila
+        self.job_store.recover(JOB_QUEUE)
+        pending = self.job_store.count(JOB_QUEUE)
+        if pending:
+            logging.info(f"{pending} link(s) pendente(s) da execução anterior serão processados")
+        # Os workers pertencem ao event loop do bot
+        self._wakeup = asyncio.Event()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _post_shutdown(self, application):
+        # Chamado pelo python-telegram-bot dentro do event loop, ao encerrar
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        # Jobs interrompidos voltam para a fila e são retomados na próxima execução
+        self.job_store.recover(JOB_QUEUE)
+        pending = self.job_store.count(JOB_QUEUE)
+        if pending:
+            logging.info(f"{pending} link(s) ficaram na fila para a próxima execução")
+        if self.shutdown_callback:
+            await self.shutdown_callback()
+
+    async def _worker(self):
+        while True:
+            job = self.job_store.claim(JOB_QUEUE, self.worker_id)
+            if job is None:
+                # Fila vazia: aproveita para apagar o histórico antigo e espera um novo
+                # link (ou confere de novo em 1s, para retentativas agendadas e leases vencidas)
+                self.job_store.purge_expired()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            self._busy_workers += 1
+            lease = asyncio.create_task(self.job_store.hold_lease(job['id'], self.worker_id))
+            try:
+                # A mensagem original é reconstruída a partir do JSON salvo, com o bot
+                # associado, para que reply_text/reply_document funcionem após um reinício
+                message = Message.de_json(job['payload'], self.app.bot)
+                ok = await self._process_link(job['url'], message)
+                if ok:
+                    self.job_store.complete(job['id'])
+                else:
+                    self.job_store.fail(job['id'], 'processamento falhou')
+            except Exception as e:
+                logging.error(f"Erro no job {job['id']} ({job['url']}): {e}")
+                self.job_store.fail(job['id'], str(e))
+            finally:
+                lease.cancel()
+                self._busy_workers -= 1
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Ignora mensagens sem texto ou comandos
         if not update.message or not update.message.text:
             return
 
-        text = update.message.text
-        # Regex para identificar links do Freepik e Envato
-        freepik_pattern = r'https?://(?:www\.)?freepik\.com/[^\s]+'
-        envato_pattern = r'https?://(?:www\.)?elements\.envato\.com/[^\s]+'
-
-        links = re.findall(f'({freepik_pattern}|{envato_pattern})', text)
-
-        if links:
-            for link in links:
-                # Responde no grupo que recebeu o link e está processando
-                await update.message.reply_text(
-                    f"🔍 Link detectado!\n"
-                    f"📥 Processando: {link}\n"
-                    f"⏳ Aguarde, isso pode levar alguns instantes..."
-                )
-                
-                # Chama o callback que fará o download e upload/envio
-                try:
-                    result = await self.download_callback(link, update.message)
-                    # O callback já envia o arquivo ou link, então não precisamos fazer nada aqui
-                    # Apenas logamos o resultado
-                    if result:
-                        logging.info(f"Processamento concluído para {link}")
-                    else:
-                        # Se result for None, o callback já deve ter enviado mensagem de erro
-                        logging.warning(f"Processamento retornou None para {link}")
-                except Exception as e:
-                    logging.error(f"Erro ao processar link {link}: {e}")
-                    await update.message.reply_text(
-                        f"❌ Erro ao processar o link.\n"
-                        f"Tente novamente mais tarde ou verifique se o link é válido."
-                    )
+        # Links do Freepik e Envato já normalizados (sem rastreamento/fragmento),
+        # sem repetir o mesmo asset
+        links = find_asset_links(update.message.text)
+
+        for link in links:
+            await self._enqueue(link, update.message)
+
+    async def _enqueue(self, link, message):
+        """Coloca o link na fila e responde na hora com a posição (ou avisa que está cheia)"""
+        if self.job_store.count(JOB_QUEUE) >= self.queue_size:
+            logging.warning(f"Fila cheia ({self.queue_size}), link recusado: {link}")
+            await message.reply_text(
+                f"🚦 Estou ocupado no momento ({self.queue_size} links na fila).\n"
+                f"Envie o link novamente em alguns minutos: {link}"
+            )
+            return
+
+        job_id = self.job_store.enqueue(JOB_QUEUE, link, payload=message.to_dict())
+        self._wakeup.set()
+
+        # Links à frente deste que ainda não foram pegos por um worker livre
+        idle_workers = self.workers - self._busy_workers
+        position = self.job_store.position(job_id) - idle_workers
+        if position > 0:
+            status = f"🕒 Posição na fila: {position}"
+        else:
+            status = "⏳ Aguarde, isso pode levar alguns instantes..."
+        # Responde no grupo que recebeu o link
+        await message.reply_text(
+            f"🔍 Link detectado!\n"
+            f"📥 Processando: {link}\n"
+            f"{status}"
+        )
+
+    async def _process_link(self, link, message):
+        """Processa um link; retorna True se o arquivo ou o link foi entregue"""
+        # Chama o callback que fará o download e upload/envio
+        try:
+            result = await self.download_callback(link, message)
+            # O callback já envia o arquivo ou link, então não precisamos fazer nada aqui
+            # Apenas logamos o resultado
+            if result:
+                logging.info(f"Processamento concluído para {link}")
+            else:
+                # Se result for None, o callback já deve ter enviado mensagem de erro
+                logging.warning(f"Processamento retornou None para {link}")
+            return bool(result)
+        except Exception as e:
+            logging.error(f"Erro ao processar link {link}: {e}")
+            await message.reply_text(
+                f"❌ Erro ao processar o link.\n"
+                f"Tente novamente mais tarde ou verifique se o link é válido."
+            )
+            return False
 
     def run(self):
         message_handler = MessageHandler(filters.TEXT & (~filters.COMMAND), self.handle_message)
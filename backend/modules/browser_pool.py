@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class BrowserPool:
+    """
+    Pool de navegadores Chromium de longa duração.
+
+    Os navegadores são iniciados uma única vez e reaproveitados entre os jobs.
+    Cada job recebe um contexto próprio (cookies/armazenamento isolados), que é
+    fechado ao final do uso. Navegadores que caíram são relançados no próximo
+    empréstimo.
+    """
+
+    def __init__(self, size=1, headless=True, user_agent=DEFAULT_USER_AGENT, launch_args=None):
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.user_agent = user_agent
+        # Argumentos extras de linha de comando do Chromium
+        self.launch_args = list(launch_args or [])
+        self._playwright = None
+        self._browsers = []
+        self._active = {}  # id(browser) -> número de contextos abertos
+        self._lock = None
+        self._loop = None
+
+    @property
+    def started(self):
+        return self._playwright is not None
+
+    async def start(self):
+        """Inicia o Playwright e os navegadores do pool (idempotente)"""
+        if self._lock is None or self._loop is not asyncio.get_running_loop():
+            # O pool pertence ao event loop em que foi iniciado
+            self._loop = asyncio.get_running_loop()
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._playwright is not None:
+                return
+            # Importado no primeiro uso: carregar o playwright é caro e nem todo
+            # processo chega a abrir um navegador
+            from playwright.async_api import async_playwright
+            logging.info(f"Iniciando pool de navegadores (tamanho: {self.size})")
+            self._playwright = await async_playwright().start()
+            for _ in range(self.size):
+                self._browsers.append(await self._launch())
+
+    async def _launch(self):
+        browser = await self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        self._active[id(browser)] = 0
+        browser.on("disconnected", lambda b: logging.warning("Navegador do pool desconectado"))
+        return browser
+
+    async def _replace(self, browser):
+        """Substitui um navegador que não está mais saudável"""
+        index = self._browsers.index(browser)
+        self._active.pop(id(browser), None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
+        logging.info("Relançando navegador do pool")
+        new_browser = await self._launch()
+        self._browsers[index] = new_browser
+        return new_browser
+
+    async def _acquire_browser(self):
+        await self.start()
+        async with self._lock:
+            # Escolhe o navegador com menos contextos abertos
+            browser = min(self._browsers, key=lambda b: self._active.get(id(b), 0))
+            if not browser.is_connected():
+                browser = await self._replace(browser)
+            self._active[id(browser)] = self._active.get(id(browser), 0) + 1
+            return browser
+
+    def _release_browser(self, browser):
+        if id(browser) in self._active:
+            self._active[id(browser)] = max(0, self._active[id(browser)] - 1)
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Empresta um contexto novo de um navegador do pool"""
+        browser = await self._acquire_browser()
+        context_options.setdefault("user_agent", self.user_agent)
+        context_options.setdefault("accept_downloads", True)
+        context = None
+        try:
+            context = await browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logging.debug(f"Erro ao fechar contexto do navegador: {e}")
+            self._release_browser(browser)
+
+    async def health_check(self):
+        """Verifica os navegadores do pool e relança os que caíram"""
+        if not self.started:
+            return {'started': False, 'browsers': 0, 'healthy': 0, 'replaced': 0}
+
+        replaced = 0
+        async with self._lock:
+            for browser in list(self._browsers):
+                if not browser.is_connected():
+                    await self._replace(browser)
+                    replaced += 1
+        return {
+            'started': True,
+            'browsers': len(self._browsers),
+            'healthy': sum(1 for b in self._browsers if b.is_connected()),
+            'replaced': replaced,
+            'active_contexts': sum(self._active.values()),
+        }
+
+    async def close(self):
+        """Fecha todos os navegadores e encerra o Playwright"""
+        if self._playwright is None:
+            return
+        logging.info("Encerrando pool de navegadores...")
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logging.debug(f"Erro ao fechar navegador: {e}")
+        self._browsers.clear()
+        self._active.clear()
+        try:
+            await self._playwright.stop()
+        except Exception as e:
+            logging.debug(f"Erro ao encerrar Playwright: {e}")
+        self._playwright = None
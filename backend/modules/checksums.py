@@ -0,0 +1,54 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_md5(file_path, chunk_size=1024 * 1024):
+    """MD5 do arquivo inteiro (usado só quando o hash não foi calculado durante a escrita)"""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _identity(file_path):
+    # Hardlinks compartilham o inode: cópias entregues pelo cache ou para pedidos
+    # coalescidos reaproveitam o hash do arquivo original
+    st = os.stat(file_path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ChecksumIndex:
+    """
+    Guarda o MD5 dos arquivos baixados, calculado enquanto eram gravados, para
+    que o upload não precise ler o arquivo de novo só para obter o hash.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, file_path, md5):
+        if not md5:
+            return
+        try:
+            key = _identity(file_path)
+        except OSError:
+            return
+        with self._lock:
+            self._entries[key] = md5
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, file_path):
+        """MD5 conhecido do arquivo ou None"""
+        try:
+            key = _identity(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            return self._entries.get(key)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+
+def link_or_copy(src, dst):
+    """Cria um hardlink (instantâneo, sem ocupar espaço extra) ou copia se não for possível"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class DownloadCache:
+    """
+    Cache local de downloads endereçado por conteúdo, com limite de tamanho (LRU).
+
+    Os arquivos ficam em `objects/<sha256>` e o índice (asset -> sha256, nome do
+    arquivo, último acesso) é salvo em `index.json`, sobrevivendo a reinícios.
+    Assets diferentes com o mesmo conteúdo compartilham o mesmo objeto. Quando o
+    total passa de `max_bytes`, os objetos menos usados recentemente são removidos.
+    """
+
+    def __init__(self, cache_path, max_bytes):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.objects_path = os.path.join(cache_path, 'objects')
+        self.index_path = os.path.join(cache_path, 'index.json')
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(self.objects_path, exist_ok=True)
+        self._index = self._load()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _load(self):
+        index = {'assets': {}, 'objects': {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index.update(json.load(f))
+            except Exception as e:
+                logging.warning(f"Índice do cache corrompido, recomeçando vazio: {e}")
+
+        # Descarta entradas cujo arquivo não existe mais
+        index['objects'] = {
+            digest: entry for digest, entry in index['objects'].items()
+            if os.path.exists(self._object_path(digest))
+        }
+        index['assets'] = {
+            key: entry for key, entry in index['assets'].items()
+            if entry.get('sha256') in index['objects']
+        }
+        return index
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar o índice do cache: {e}")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_path, digest)
+
+    @property
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self._index['objects'].values())
+
+    def get(self, asset_key, dest_dir, reserve_path):
+        """
+        Procura o asset no cache. Em caso de acerto, disponibiliza uma cópia
+        (hardlink) em `dest_dir` e retorna o caminho; senão retorna None.
+
+        `reserve_path(dest_dir, filename)` reserva um nome de arquivo livre.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._index['assets'].get(asset_key)
+            if not entry:
+                self.stats['misses'] += 1
+                return None
+
+            source = self._object_path(entry['sha256'])
+            if not os.path.exists(source):
+                self._drop_object(entry['sha256'])
+                self._save()
+                self.stats['misses'] += 1
+                return None
+
+            now = time.time()
+            entry['last_access'] = now
+            self._index['objects'][entry['sha256']]['last_access'] = now
+            self._save()
+            self.stats['hits'] += 1
+
+            # Dentro do lock para que o objeto não seja removido no meio da cópia
+            path = reserve_path(dest_dir, entry['filename'])
+            tmp_path = f"{path}.cache"
+            link_or_copy(source, tmp_path)
+            os.replace(tmp_path, path)
+
+        logging.info(f"Asset encontrado no cache local: {asset_key}")
+        return path
+
+    def checksum(self, asset_key):
+        """MD5 do conteúdo do asset guardado no cache, ou None"""
+        with self._lock:
+            entry = self._index['assets'].get(asset_key)
+            if not entry:
+                return None
+            return self._index['objects'].get(entry['sha256'], {}).get('md5')
+
+    def put(self, asset_key, file_path):
+        """Adiciona o arquivo baixado ao cache e aplica o limite de tamanho"""
+        if not self.enabled or not os.path.exists(file_path):
+            return None
+        size = os.path.getsize(file_path)
+        if size > self.max_bytes:
+            return None
+
+        digest, md5 = self._digests(file_path)
+        with self._lock:
+            target = self._object_path(digest)
+            if not os.path.exists(target):
+                link_or_copy(file_path, target)
+            now = time.time()
+            self._index['objects'][digest] = {'size': size, 'md5': md5, 'last_access': now}
+            self._index['assets'][asset_key] = {
+                'sha256': digest,
+                'filename': os.path.basename(file_path),
+                'size': size,
+                'last_access': now,
+            }
+            self._evict()
+            self._save()
+        return digest
+
+    def _evict(self):
+        """Remove os objetos menos usados recentemente até caber no limite"""
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        for digest, entry in sorted(self._index['objects'].items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            self._drop_object(digest)
+            self.stats['evictions'] += 1
+
+    def _drop_object(self, digest):
+        self._index['objects'].pop(digest, None)
+        self._index['assets'] = {
+            key: entry for key, entry in self._index['assets'].items() if entry['sha256'] != digest
+        }
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _digests(file_path, chunk_size=1024 * 1024):
+        """SHA-256 (endereço do objeto) e MD5 (usado pelo Drive) em uma única leitura"""
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+                md5.update(chunk)
+        return sha256.hexdigest(), md5.hexdigest()
@@ -1,100 +1,353 @@
 import os
+import time
+import asyncio
 import logging
-from playwright.async_api import async_playwright
+from .browser_pool import BrowserPool
+from .session_store import SessionStore
+from .selector_stats import SelectorStats
+from .request_filter import RequestFilter
+from .asset_url import canonical_asset_key, get_provider, is_login_url
+from .download_cache import link_or_copy
+from .checksums import ChecksumIndex
+from .metrics import metrics
+
+# Banner de consentimento de cookies (OneTrust) usado pelo Freepik
+COOKIE_BANNER_SELECTOR = "#onetrust-accept-btn-handler"
+
+# Indica que a página do arquivo do Freepik está pronta para o download
+FREEPIK_READY_SELECTOR = (
+    'button:has-text("Download"), a:has-text("Download"), '
+    'button:has-text("Baixar"), a:has-text("Baixar")'
+)
+
+# Páginas de login e o formulário que elas mostram quando não há sessão
+LOGIN_URLS = {
+    'freepik': "https://www.freepik.com/login",
+    'envato': "https://elements.envato.com/sign-in",
+}
+LOGIN_FORMS = {
+    'freepik': 'input[name="email"], input[type="email"], button:has-text("Continue with email"), a:has-text("Continue with email")',
+    'envato': '#username',
+}
+# Elementos visíveis tentados por estratégia de busca do botão de download
+STRATEGY_MAX_MATCHES = 5
+# Sinais positivos de sessão ativa: cookie de autenticação ou menu da conta no cabeçalho
+LOGGED_IN_COOKIES = {
+    'freepik': ('GR_TOKEN', 'GR_REFRESH'),
+    'envato': (),
+}
+LOGGED_IN_SELECTORS = {
+    'freepik': 'header [data-cy*="avatar"], header img[alt*="avatar" i], header a[href*="/user/"]',
+    'envato': 'header [data-testid*="user-menu"], header img[alt*="avatar" i], header a[href*="/account"]',
+}
+
+class DirectTransferFailed(Exception):
+    """A transferência direta falhou depois que o download do navegador foi cancelado"""
+
+async def first_event(waiters, timeout):
+    """
+    Aguarda a primeira condição satisfeita entre várias esperas do Playwright.
+
+    `waiters` é um dict nome -> awaitable. Retorna o nome da primeira espera
+    concluída sem erro, ou None se nenhuma for satisfeita em `timeout` ms.
+    As esperas restantes são canceladas.
+    """
+    tasks = {asyncio.ensure_future(aw): name for name, aw in waiters.items()}
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout / 1000
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return tasks[task]
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+        # Consome as exceções das esperas canceladas/falhas
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def race_locators(candidates, timeout):
+    """
+    Corrida entre locators: aguarda todos ao mesmo tempo e retorna o primeiro visível.
+
+    `candidates` é uma lista de (nome, locator) em ordem de preferência. Todas as
+    esperas rodam em paralelo, então o custo total é uma única espera limitada por
+    `timeout` (ms), e não a soma dos timeouts de cada seletor. Quando o vencedor é
+    conhecido, os candidatos de maior preferência são verificados instantaneamente,
+    para que um seletor melhor ranqueado que já estava visível não perca por
+    diferença de milissegundos.
+
+    Retorna (nome, locator) ou (None, None) se nenhum ficar visível a tempo.
+    """
+    if not candidates:
+        return None, None
+
+    locators = dict(candidates)
+    winner = await first_event(
+        {name: locator.wait_for(state="visible", timeout=timeout) for name, locator in candidates},
+        timeout
+    )
+    if winner is None:
+        return None, None
+
+    for name, locator in candidates:
+        if name == winner:
+            break
+        try:
+            if await locator.is_visible():
+                return name, locator
+        except Exception:
+            continue
+    return winner, locators[winner]
+
 
 class Downloader:
-    def __init__(self, freepik_creds, envato_creds, download_path):
+    def __init__(self, freepik_creds, envato_creds, download_path, browser_pool_size=1, headless=True, session_path=None, selector_stats_path=None,
+                 block_requests=True, blocked_resource_types=None, transfer_engine=None,
+                 download_cache=None):
         self.freepik_creds = freepik_creds
         self.envato_creds = envato_creds
         self.download_path = download_path
         if not os.path.exists(self.download_path):
             os.makedirs(self.download_path)
 
-    async def download_file(self, url):
-        async with async_playwright() as p:
-            # Lançar navegador. Em produção, headless=True é recomendado.
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        # Pool de navegadores compartilhado por todos os downloads e testes de login.
+        # Evita o custo de iniciar o Chromium a cada link.
+        self.browser_pool = BrowserPool(size=browser_pool_size, headless=headless)
+
+        # Sessões autenticadas (storage_state) reaproveitadas entre os jobs
+        self.session_store = SessionStore(session_path)
+
+        # Histórico de quais textos/seletores realmente geraram downloads
+        self.selector_stats = SelectorStats(selector_stats_path)
+
+        # Bloqueio de imagens, fontes, mídia e rastreadores nas páginas automatizadas
+        self.request_filter = RequestFilter(enabled=block_requests, block_types=blocked_resource_types)
+
+        # Transferência direta por HTTP após o navegador resolver a URL do arquivo
+        # (None = sempre usar o download do navegador)
+        self.transfer_engine = transfer_engine
+
+        # Cache local endereçado por conteúdo (None = sem cache)
+        self.download_cache = download_cache
+
+        # MD5 dos arquivos calculado durante a gravação (usado na deduplicação do Drive)
+        self.checksums = ChecksumIndex()
+
+    async def close(self):
+        """Encerra o pool de navegadores e salva as estatísticas de seletores"""
+        self.selector_stats.flush()
+        if self.download_cache:
+            stats = self.download_cache.stats
+            logging.info(
+                f"Cache local: {stats['hits']} acertos, {stats['misses']} falhas, {stats['evictions']} remoções, "
+                f"{self.download_cache.total_bytes / 1024 / 1024:.2f}MB em uso"
+            )
+        if self.transfer_engine:
+            stats = self.transfer_engine.stats
+            if stats['transfers']:
+                logging.info(
+                    f"Transferências diretas: {stats['transfers']} ({stats['failures']} falhas), "
+                    f"{stats['bytes'] / 1024 / 1024:.2f}MB a {stats['bytes'] / stats['seconds'] / 1024 / 1024:.2f}MB/s em média"
+                )
+            await self.transfer_engine.close()
+        for provider, rows in self.selector_stats.report().items():
+            summary = ", ".join(f"{r['strategy']} ({r['hits']} acertos / {r['misses']} falhas)" for r in rows[:5])
+            logging.info(f"Estratégias de download mais efetivas no {provider}: {summary}")
+        for provider, stats in self.request_filter.report().items():
+            logging.info(
+                f"Requisições no {provider}: {stats['blocked_requests']}/{stats['requests']} bloqueadas "
+                f"{stats['blocked_by_type']}, {stats['loaded_bytes'] / 1024 / 1024:.2f}MB carregados"
             )
-            page = await context.new_page()
+        await self.browser_pool.close()
+
+    @staticmethod
+    def get_provider(url):
+        """Retorna o provedor ('freepik' ou 'envato') da URL, ou None se não suportada"""
+        return get_provider(url)
+
+    async def download_file(self, url, open_stream=None):
+        """
+        Baixa o arquivo da URL e retorna o caminho local (None em caso de falha).
+
+        `open_stream(nome, tamanho)` é repassado ao TransferEngine: se devolver um
+        StreamBuffer, o conteúdo vai direto para ele e nenhum arquivo é criado.
+        """
+        provider = self.get_provider(url)
+        if provider is None:
+            logging.warning(f"URL não suportada: {url}")
+            return None
 
+        loop = asyncio.get_running_loop()
+        asset_key = canonical_asset_key(url)
+
+        # Acerto no cache: entrega direto, sem abrir o navegador
+        if self.download_cache:
             try:
-                if "freepik.com" in url:
-                    file_path = await self._download_freepik(page, url)
-                elif "elements.envato.com" in url:
-                    file_path = await self._download_envato(page, url)
+                with metrics.stage('cache_lookup', provider=provider) as stage:
+                    cached_path = await loop.run_in_executor(
+                        None, self.download_cache.get, asset_key, self.download_path, self.reserve_path
+                    )
+                    stage.outcome = 'hit' if cached_path else 'miss'
+                if cached_path:
+                    self.checksums.remember(cached_path, self.download_cache.checksum(asset_key))
+                    return cached_path
+            except Exception as e:
+                logging.warning(f"Erro ao consultar o cache local: {e}")
+
+        try:
+            # Cada job recebe um contexto isolado de um navegador já aberto,
+            # já com a sessão salva do provedor (se existir)
+            storage_state = self.session_store.get(provider)
+            async with self.browser_pool.context(storage_state=storage_state) as context:
+                await self.request_filter.attach(context, provider)
+                page = await context.new_page()
+
+                if provider == 'freepik':
+                    # O banner de cookies é aceito em segundo plano, quando aparecer,
+                    # sem travar o fluxo principal esperando por ele
+                    banner_task = self._dismiss_cookie_banner(page)
+                    try:
+                        file_path = await self._download_freepik(page, url, open_stream)
+                    finally:
+                        banner_task.cancel()
                 else:
-                    logging.warning(f"URL não suportada: {url}")
-                    file_path = None
-                
-                return file_path
+                    file_path = await self._download_envato(page, url, open_stream)
+        except Exception as e:
+            logging.error(f"Erro durante o download de {url}: {e}")
+            return None
+
+        if file_path and self.download_cache and os.path.exists(file_path):
+            try:
+                await loop.run_in_executor(None, self.download_cache.put, asset_key, file_path)
+                # O cache acabou de ler o arquivo inteiro: reaproveita o MD5 (downloads pelo
+                # navegador não têm hash calculado durante a gravação)
+                if not self.checksums.lookup(file_path):
+                    self.checksums.remember(file_path, self.download_cache.checksum(asset_key))
             except Exception as e:
-                logging.error(f"Erro durante o download de {url}: {e}")
-                return None
-            finally:
-                await browser.close()
+                logging.warning(f"Não foi possível adicionar o arquivo ao cache: {e}")
+        return file_path
+
+    @classmethod
+    def duplicate_file(cls, path):
+        """Cria uma cópia independente do arquivo (hardlink quando possível) ao lado do original"""
+        copy_path = cls.reserve_path(os.path.dirname(path), os.path.basename(path))
+        tmp_path = f"{copy_path}.copy"
+        link_or_copy(path, tmp_path)
+        os.replace(tmp_path, copy_path)
+        return copy_path
+
+    @staticmethod
+    def reserve_path(directory, filename):
+        """
+        Reserva um caminho livre em `directory` criando o arquivo vazio de forma
+        atômica. Downloads simultâneos com o mesmo nome recebem "nome (1).ext",
+        "nome (2).ext"... em vez de se sobrescreverem.
+        """
+        filename = os.path.basename(filename) or "download"
+        name, ext = os.path.splitext(filename)
+        counter = 0
+        while True:
+            candidate = filename if counter == 0 else f"{name} ({counter}){ext}"
+            path = os.path.join(directory, candidate)
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                counter += 1
+
+    async def _relogin(self, provider, page, login, started_at):
+        """
+        Refaz o login do provedor quando a sessão expirou.
+
+        Apenas um job faz login por vez. Se outro job já renovou a sessão
+        enquanto este aguardava, os cookies novos são reaproveitados.
+        Retorna True se a sessão foi renovada por este job ou por outro.
+        """
+        async with self.session_store.login_lock(provider):
+            if self.session_store.saved_after(provider, started_at):
+                logging.info(f"Sessão do {provider} renovada por outro job, reaproveitando")
+                return await self.session_store.apply(provider, page.context)
 
-    async def _download_freepik(self, page, url):
+            self.session_store.invalidate(provider)
+            with metrics.stage('login', provider=provider) as stage:
+                if await login(page):
+                    await self.session_store.save(provider, page.context)
+                    return True
+                stage.outcome = 'failed'
+            return False
+
+    @staticmethod
+    def _is_login_url(url):
+        return is_login_url(url)
+
+    @staticmethod
+    def _dismiss_cookie_banner(page, timeout=15000):
+        """Clica no banner de cookies assim que ele aparecer (tarefa em segundo plano)"""
+        async def dismiss():
+            try:
+                await page.click(COOKIE_BANNER_SELECTOR, timeout=timeout)
+                logging.info("Cookies aceitos")
+            except Exception:
+                pass
+        return asyncio.ensure_future(dismiss())
+
+    async def _wait_freepik_ready(self, page, timeout=20000):
+        """
+        Aguarda a página do arquivo ficar pronta (botão de download visível)
+        ou o redirecionamento para o login, o que acontecer primeiro.
+        """
+        with metrics.stage('page_ready', provider='freepik') as stage:
+            state = await first_event({
+                'login': page.wait_for_url(self._is_login_url, timeout=timeout),
+                'ready': page.locator(FREEPIK_READY_SELECTOR).first.wait_for(state="visible", timeout=timeout),
+            }, timeout)
+            if state is None:
+                stage.outcome = 'failed'
+        return state
+
+    async def _download_freepik(self, page, url, open_stream=None):
         # Configurar timeout maior para downloads
         page.set_default_timeout(90000)  # 90 segundos
         
         logging.info(f"Acessando Freepik para download: {url}")
+        started_at = time.time()
         
         # Primeiro, tentar ir direto para a URL do arquivo
         # Se não estiver logado, o Freepik vai redirecionar para login
         try:
             logging.info(f"Navegando para a página do arquivo: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            
-            # Aceitar cookies se aparecer
-            try:
-                await page.click("#onetrust-accept-btn-handler", timeout=5000)
-                logging.info("Cookies aceitos")
-                await page.wait_for_timeout(1000)
-            except:
-                pass
+            with metrics.stage('page_goto', provider='freepik'):
+                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
             
-            # Verificar se precisa fazer login (verifica se está na página de login)
-            await page.wait_for_load_state("networkidle", timeout=20000)
-            current_url = page.url
+            # Verificar se precisa fazer login: espera o redirecionamento para o login
+            # ou o botão de download, em vez de aguardar a rede ficar ociosa
+            state = await self._wait_freepik_ready(page)
             
-            # Se está na página de login, fazer login
-            if "login" in current_url.lower() or "sign-in" in current_url.lower():
+            # Se está na página de login, a sessão não existe ou expirou
+            if state == 'login' or self._is_login_url(page.url):
                 logging.info("Precisa fazer login, redirecionado para página de login")
-                
-                # Aceitar cookies novamente se aparecer
-                try:
-                    await page.click("#onetrust-accept-btn-handler", timeout=5000)
-                    await page.wait_for_timeout(1000)
-                except:
-                    pass
-                
-                # Clicar em "Continue with email" se aparecer
-                try:
-                    continue_email_btn = page.locator('button:has-text("Continue with email"), a:has-text("Continue with email")').first
-                    if await continue_email_btn.is_visible(timeout=5000):
-                        await continue_email_btn.click()
-                        await page.wait_for_timeout(2000)
-                        logging.info("Botão 'Continue with email' clicado")
-                except:
-                    pass
-                
-                # Preencher email e senha
-                await page.fill('input[name="email"], input[type="email"]', self.freepik_creds['email'])
-                await page.fill('input[name="password"], input[type="password"]', self.freepik_creds['password'])
-                await page.click('button[type="submit"]')
-                await page.wait_for_load_state("networkidle", timeout=20000)
-                await page.wait_for_timeout(3000)
+                if not await self._relogin('freepik', page, self._login_freepik, started_at):
+                    logging.error("Falha no login do Freepik")
+                    return None
                 
                 # Voltar para a URL do arquivo após login
                 logging.info("Login realizado, voltando para a página do arquivo")
                 await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                await page.wait_for_load_state("networkidle", timeout=30000)
+                state = await self._wait_freepik_ready(page)
             else:
                 logging.info("Já está logado ou não precisa de login")
             
-            await page.wait_for_timeout(2000)  # Aguardar página carregar completamente
+            if state != 'ready':
+                logging.warning("Botão de download não apareceu a tempo, tentando localizar mesmo assim")
             logging.info("Página do arquivo carregada")
         except Exception as e:
             logging.error(f"Erro ao carregar página do arquivo: {e}")
@@ -138,49 +391,49 @@ class Downloader:
         button_count = await all_buttons.count()
         logging.info(f"Encontrados {button_count} botões/links na página")
         
-        # Procurar por texto "Download" ou "Baixar" em todos os elementos
+        # Procurar por texto "Download" ou "Baixar" em todos os elementos e, em seguida,
+        # pelos seletores específicos. As estratégias que mais funcionaram recentemente
+        # são tentadas primeiro.
         download_texts = ['Download', 'Baixar', 'download', 'baixar', 'DESCARGAR', 'Descargar']
-        for text in download_texts:
-            try:
-                elements = page.locator(f'button:has-text("{text}"), a:has-text("{text}")')
-                count = await elements.count()
-                if count > 0:
-                    logging.info(f"Encontrado {count} elemento(s) com texto '{text}'")
-                    for i in range(count):
-                        try:
-                            elem = elements.nth(i)
-                            if await elem.is_visible(timeout=3000):
-                                logging.info(f"Tentando clicar no elemento {i+1} com texto '{text}'")
-                                async with page.expect_download(timeout=60000) as download_info:
-                                    await elem.click()
-                                download = await download_info.value
-                                path = os.path.join(self.download_path, download.suggested_filename)
-                                await download.save_as(path)
-                                logging.info(f"Download concluído: {path}")
-                                return path
-                        except Exception as e:
-                            logging.debug(f"Erro ao clicar no elemento {i+1}: {e}")
-                            continue
-            except:
-                continue
+        strategies = [f"text:{text}" for text in download_texts] + [f"selector:{selector}" for selector in download_selectors]
         
-        # Se não encontrou por texto, tentar pelos seletores específicos
-        for selector in download_selectors:
+        # Todas as estratégias disputam uma corrida única: o primeiro elemento visível
+        # vence. Se o clique não gerar download, a estratégia passa para o próximo
+        # elemento visível que ela encontra; só é descartada (e conta como erro)
+        # depois de tentar todos eles.
+        matches = {strategy: 0 for strategy in strategies}
+        remaining = [
+            (strategy, self._strategy_locator(page, strategy))
+            for strategy in self.selector_stats.order('freepik', strategies)
+        ]
+        while remaining:
+            with metrics.stage('selector_search', provider='freepik') as stage:
+                strategy, locator = await race_locators(remaining, timeout=10000)
+                if strategy is None:
+                    stage.outcome = 'failed'
+            if strategy is None:
+                break
+            
+            index = matches[strategy]
+            logging.info(f"Botão de download encontrado com a estratégia: {strategy} (elemento {index + 1})")
+            path = await self._click_and_download(page, locator, open_stream=open_stream)
+            if path:
+                self.selector_stats.record_hit('freepik', strategy)
+                return path
+            
+            matches[strategy] = index + 1
             try:
-                btn = page.locator(selector).first
-                # Aguardar o botão aparecer
-                if await btn.is_visible(timeout=5000):
-                    logging.info(f"Botão de download encontrado com seletor: {selector}")
-                    async with page.expect_download(timeout=60000) as download_info:
-                        await btn.click()
-                    download = await download_info.value
-                    path = os.path.join(self.download_path, download.suggested_filename)
-                    await download.save_as(path)
-                    logging.info(f"Download concluído: {path}")
-                    return path
-            except Exception as e:
-                logging.debug(f"Seletor {selector} não funcionou: {e}")
-                continue
+                visible = await self._strategy_locator(page, strategy, None).count()
+            except Exception:
+                visible = 0
+            if matches[strategy] < min(visible, STRATEGY_MAX_MATCHES):
+                remaining = [
+                    (name, self._strategy_locator(page, name, matches[name]) if name == strategy else loc)
+                    for name, loc in remaining
+                ]
+            else:
+                self.selector_stats.record_miss('freepik', strategy)
+                remaining = [(name, loc) for name, loc in remaining if name != strategy]
         
         # Se não encontrou, tentar salvar screenshot para debug
         try:
@@ -192,385 +445,307 @@ class Downloader:
         logging.error("Botão de download não encontrado no Freepik após tentar todos os seletores.")
         return None
 
-    async def _download_envato(self, page, url):
-        logging.info(f"Acessando Envato para download: {url}")
-        # Login
-        await page.goto("https://elements.envato.com/sign-in")
+    async def _save_download(self, download, open_stream=None):
+        provider = get_provider(download.page.url) or 'unknown'
+        with metrics.stage('save_download', provider=provider):
+            path = await self._store_download(download, open_stream)
+        if os.path.exists(path):
+            metrics.inc('bytes_total', os.path.getsize(path), direction='download', provider=provider)
+        return path
+
+    async def _store_download(self, download, open_stream=None):
+        """
+        Salva o download iniciado pelo navegador.
+
+        Com o TransferEngine, o navegador só serve para descobrir a URL real: assim
+        que o servidor confirma que entrega o arquivo por HTTP, o download do
+        navegador é cancelado e os bytes vêm só pela transferência direta. Se ela
+        falhar depois disso, levanta DirectTransferFailed (o chamador clica de novo para
+        obter uma URL nova).
+        """
+        path = self.reserve_path(self.download_path, download.suggested_filename)
+        
+        if self.transfer_engine and download.url.startswith(('http://', 'https://')):
+            headers = {'User-Agent': self.browser_pool.user_agent, 'Referer': download.page.url}
+            try:
+                cookies = await download.page.context.cookies(download.url)
+                probe = await self.transfer_engine.probe(download.url, cookies, headers)
+            except Exception as e:
+                logging.warning(f"Transferência direta indisponível ({e}), usando o download do navegador")
+                probe = None
+
+            if probe is not None:
+                # O servidor respondeu: o download do navegador não é mais necessário
+                await self._cancel_browser_download(download)
+                try:
+                    result = await self.transfer_engine.fetch(
+                        download.url, path, cookies=cookies, headers=headers,
+                        open_stream=open_stream, probe=probe
+                    )
+                except Exception as e:
+                    os.remove(path)
+                    raise DirectTransferFailed(f"Transferência direta falhou: {e}") from e
+                if result['streamed']:
+                    # Conteúdo foi direto para o upload: nenhum arquivo local
+                    os.remove(path)
+                    metrics.inc(
+                        'bytes_total', result['bytes'], direction='download',
+                        provider=get_provider(download.page.url) or 'unknown'
+                    )
+                    logging.info(
+                        f"Download transmitido direto para o upload: {os.path.basename(path)} "
+                        f"({result['bytes'] / 1024 / 1024:.2f}MB em {result['seconds']:.1f}s)"
+                    )
+                    return path
+                self.checksums.remember(path, result['md5'])
+                logging.info(
+                    f"Download concluído: {path} ({result['bytes'] / 1024 / 1024:.2f}MB em "
+                    f"{result['seconds']:.1f}s, {result['throughput'] / 1024 / 1024:.2f}MB/s)"
+                )
+                return path
+        
+        try:
+            await download.save_as(path)
+        except Exception:
+            os.remove(path)
+            raise
+        logging.info(f"Download concluído: {path}")
+        return path
+
+    @staticmethod
+    async def _cancel_browser_download(download):
+        """Cancela o download do navegador, dispensado pela transferência direta"""
+        try:
+            await download.cancel()
+        except Exception as e:
+            logging.debug(f"Não foi possível cancelar o download do navegador: {e}")
+
+    @staticmethod
+    def _strategy_locator(page, strategy, index=0):
+        """
+        Converte uma estratégia ('text:...' ou 'selector:...') no locator do
+        `index`-ésimo elemento visível que ela encontra (None: todos eles).
+        """
+        kind, value = strategy.split(':', 1)
+        if kind == 'text':
+            selector = f'button:has-text("{value}"), a:has-text("{value}")'
+        else:
+            selector = value
+        locator = page.locator(f"{selector} >> visible=true")
+        return locator if index is None else locator.nth(index)
+
+    async def _click_and_download(self, page, locator, timeout=60000, open_stream=None, max_resolves=2):
+        """
+        Clica no elemento e salva o download gerado.
+
+        Retorna None se o clique não gerou download (o seletor errou). Se a
+        transferência direta falhar depois de o download do navegador ter sido
+        cancelado, clica de novo (até `max_resolves` vezes) para obter uma URL
+        nova. Outras falhas ao salvar são propagadas: não dizem nada sobre o
+        seletor e não devem levar a outro clique.
+        """
+        for attempt in range(1, max_resolves + 1):
+            try:
+                with metrics.stage('expect_download', provider=get_provider(page.url) or 'unknown'):
+                    async with page.expect_download(timeout=timeout) as download_info:
+                        await locator.click()
+                    download = await download_info.value
+            except Exception as e:
+                logging.debug(f"Clique não gerou download: {e}")
+                return None
+            try:
+                return await self._save_download(download, open_stream)
+            except DirectTransferFailed as e:
+                if attempt == max_resolves:
+                    raise
+                logging.warning(f"{e}; clicando de novo para obter uma nova URL do arquivo")
+
+    async def _login_freepik(self, page):
+        """Faz login no Freepik a partir da página de login já aberta"""
+        email_input = page.locator('input[name="email"], input[type="email"]').first
+        continue_email_btn = page.locator('button:has-text("Continue with email"), a:has-text("Continue with email")').first
+        
+        # O formulário pode aparecer direto ou atrás do botão "Continue with email"
+        step = await first_event({
+            'form': email_input.wait_for(state="visible", timeout=15000),
+            'continue': continue_email_btn.wait_for(state="visible", timeout=15000),
+        }, 15000)
+        if step == 'continue':
+            await continue_email_btn.click()
+            logging.info("Botão 'Continue with email' clicado")
+            await email_input.wait_for(state="visible", timeout=10000)
+        
+        # Preencher email e senha
+        await page.fill('input[name="email"], input[type="email"]', self.freepik_creds['email'])
+        await page.fill('input[name="password"], input[type="password"]', self.freepik_creds['password'])
+        await page.click('button[type="submit"]')
+        
+        # O login terminou quando a URL sai da página de login
+        try:
+            await page.wait_for_url(lambda u: not self._is_login_url(u), timeout=20000)
+        except Exception:
+            pass
+        
+        return await self._logged_in(page, 'freepik')
+
+    async def _login_envato(self, page):
+        """Faz login no Envato Elements"""
+        await page.goto(LOGIN_URLS['envato'], wait_until="domcontentloaded")
         await page.fill('#username', self.envato_creds['email'])
         await page.fill('#password', self.envato_creds['password'])
         await page.click('button[type="submit"]')
-        await page.wait_for_load_state("networkidle")
+        # Aguarda o redirecionamento em vez de "networkidle", que trava em
+        # páginas com analytics fazendo polling
+        try:
+            await page.wait_for_url(lambda u: not self._is_login_url(u), timeout=30000)
+        except Exception:
+            pass
+        return await self._logged_in(page, 'envato')
+
+    async def _logged_in(self, page, provider, timeout=10000):
+        """
+        Confirma a sessão com um sinal positivo (cookie de autenticação ou menu da
+        conta), e não só porque a URL deixou de ser de login: um login preso em uma
+        página intermediária (captcha, verificação) não pode ser salvo como sessão.
+        """
+        if self._is_login_url(page.url):
+            return False
+        try:
+            cookies = await page.context.cookies()
+            if any(cookie['name'] in LOGGED_IN_COOKIES[provider] for cookie in cookies):
+                return True
+            await page.locator(LOGGED_IN_SELECTORS[provider]).first.wait_for(state="visible", timeout=timeout)
+            return True
+        except Exception:
+            logging.warning(f"Login do {provider} sem sinal de sessão ativa em {page.url}")
+            return False
+
+    async def _envato_logged_out(self, page):
+        """Detecta se a sessão do Envato expirou (redirecionado ou link de login no cabeçalho)"""
+        if self._is_login_url(page.url):
+            return True
+        try:
+            return await page.locator('header a[href*="/sign-in"]').count() > 0
+        except Exception:
+            return False
+
+    async def _wait_envato_ready(self, page, download_btn, timeout=30000):
+        """Aguarda o botão de download do Envato ou o redirecionamento para o login"""
+        with metrics.stage('page_ready', provider='envato') as stage:
+            state = await first_event({
+                'login': page.wait_for_url(self._is_login_url, timeout=timeout),
+                'ready': download_btn.wait_for(state="visible", timeout=timeout),
+            }, timeout)
+            if state is None:
+                stage.outcome = 'failed'
+        return state
+
+    async def _download_envato(self, page, url, open_stream=None):
+        logging.info(f"Acessando Envato para download: {url}")
+        started_at = time.time()
+
+        # Login apenas se não houver sessão salva
+        if not self.session_store.get('envato'):
+            if not await self._relogin('envato', page, self._login_envato, started_at):
+                logging.error("Falha no login do Envato")
+                return None
 
         # Ir para a URL do arquivo
-        await page.goto(url)
+        download_btn = page.locator('button:has-text("Download")').first
+        with metrics.stage('page_goto', provider='envato'):
+            await page.goto(url, wait_until="domcontentloaded")
+        state = await self._wait_envato_ready(page, download_btn)
+
+        # Sessão salva expirou: refaz o login e volta para o arquivo
+        if state == 'login' or await self._envato_logged_out(page):
+            logging.info("Sessão do Envato expirada, refazendo login")
+            if not await self._relogin('envato', page, self._login_envato, started_at):
+                logging.error("Falha no login do Envato")
+                return None
+            await page.goto(url, wait_until="domcontentloaded")
+            await self._wait_envato_ready(page, download_btn)
         
         # Botão de download inicial
-        download_btn = page.locator('button:has-text("Download")').first
         if await download_btn.is_visible():
             await download_btn.click()
             
             # Envato geralmente pede para selecionar um projeto ou licença
             # Vamos tentar clicar em "Download without a project" ou similar se disponível
             # Ou simplesmente "Add & Download" se as configurações permitirem
-            confirm_btn = page.locator('button:has-text("Add & Download"), button:has-text("Download")').last
+            with metrics.stage('selector_search', provider='envato'):
+                name, confirm_btn = await race_locators([
+                    ('add_and_download', page.locator('button:has-text("Add & Download") >> visible=true').first),
+                    ('dialog_download', page.locator('[role="dialog"] button:has-text("Download") >> visible=true').first),
+                ], timeout=15000)
+            if confirm_btn is None:
+                # Sem diálogo de confirmação: último botão "Download" da página
+                confirm_btn = page.locator('button:has-text("Add & Download"), button:has-text("Download")').last
+            
             if await confirm_btn.is_visible():
-                async with page.expect_download() as download_info:
-                    await confirm_btn.click()
-                download = await download_info.value
-                path = os.path.join(self.download_path, download.suggested_filename)
-                await download.save_as(path)
-                logging.info(f"Download concluído: {path}")
-                return path
+                path = await self._click_and_download(page, confirm_btn, timeout=30000, open_stream=open_stream)
+                if path:
+                    return path
                 
         logging.error("Botão de download não encontrado no Envato.")
         return None
     
-    async def test_freepik_login(self):
-        """Testa se o login no Freepik está funcionando"""
+    async def _session_valid(self, page, provider, timeout=15000):
+        """
+        Teste barato da sessão aplicada ao contexto, sem enviar credenciais: abre a
+        página de login e vê se o provedor redireciona para fora dela (já logado)
+        ou mostra o formulário. Fora da página de login, a sessão ainda precisa
+        de um sinal positivo (`_logged_in`).
+        """
+        await page.goto(LOGIN_URLS[provider], wait_until="domcontentloaded", timeout=30000)
+        if not self._is_login_url(page.url):
+            return await self._logged_in(page, provider)
+        state = await first_event({
+            'logged_in': page.wait_for_url(lambda u: not self._is_login_url(u), timeout=timeout),
+            'form': page.locator(LOGIN_FORMS[provider]).first.wait_for(state="visible", timeout=timeout),
+        }, timeout)
+        return state == 'logged_in' and await self._logged_in(page, provider)
+
+    async def test_login(self, provider):
+        """
+        Testa se o login do provedor está funcionando.
+
+        Primeiro confere a sessão salva (a mesma usada pelos downloads); o login
+        completo só é feito se ela não existir ou tiver expirado, e a sessão nova
+        fica salva para os próximos jobs.
+        """
+        login = self._login_freepik if provider == 'freepik' else self._login_envato
+        started_at = time.time()
+        storage_state = self.session_store.get(provider)
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
+            async with self.browser_pool.context(storage_state=storage_state) as context:
+                await self.request_filter.attach(context, provider)
                 page = await context.new_page()
-                page.set_default_timeout(30000)  # Timeout padrão de 30 segundos
-                
+                banner_task = self._dismiss_cookie_banner(page) if provider == 'freepik' else None
                 try:
-                    logging.info("Acessando página de login do Freepik...")
-                    await page.goto("https://www.freepik.com/login", wait_until="domcontentloaded", timeout=30000)
-                    
-                    # Aceitar cookies se aparecer
-                    try:
-                        await page.click("#onetrust-accept-btn-handler", timeout=5000)
-                        logging.info("Cookies aceitos")
-                        await page.wait_for_timeout(1000)  # Aguardar após aceitar cookies
-                    except:
-                        pass
-                    
-                    # Aguardar a página carregar completamente
-                    await page.wait_for_load_state("networkidle", timeout=15000)
-                    await page.wait_for_timeout(2000)  # Aguardar um pouco mais para garantir
-                    
-                    # Primeiro, verificar se os campos já estão visíveis
-                    email_input_check = page.locator('input[type="email"], input[name="email"]').first
-                    try:
-                        if await email_input_check.is_visible(timeout=3000):
-                            logging.info("Campos de login já estão visíveis na página")
-                            email_button_clicked = False  # Não precisa clicar no botão
-                        else:
-                            email_button_clicked = None  # Ainda não sabemos
-                    except:
-                        email_button_clicked = None  # Ainda não sabemos
-                    
-                    # Se os campos não estão visíveis, tentar clicar no botão "Continue with email"
-                    if email_button_clicked is None:
-                        logging.info("Procurando botão 'Continue with email'...")
-                        continue_email_selectors = [
-                            'button:has-text("Continue with email")',
-                            'button:has-text("Continue with Email")',
-                            'button:has-text("continue with email")',
-                            'button:has-text("email")',
-                            'a:has-text("Continue with email")',
-                            'a:has-text("email")',
-                            '[data-testid*="email"]',
-                            'button[class*="email"]',
-                            'a[class*="email"]',
-                            'button:has([class*="email"])',
-                            'a:has([class*="email"])'
-                        ]
-                        
-                        email_button_clicked = False
-                        for selector in continue_email_selectors:
-                            try:
-                                email_button = page.locator(selector).first
-                                if await email_button.is_visible(timeout=5000):
-                                    await email_button.click()
-                                    logging.info(f"Botão 'Continue with email' clicado usando seletor: {selector}")
-                                    email_button_clicked = True
-                                    break
-                            except:
-                                continue
-                    
-                    if email_button_clicked:
-                        # Aguardar os campos de email e senha aparecerem após clicar
-                        logging.info("Aguardando campos de login aparecerem...")
-                        await page.wait_for_timeout(2000)
-                        try:
-                            # Aguardar até que um campo de email ou senha apareça
-                            await page.wait_for_selector('input[type="email"], input[name="email"], input[type="password"], input[name="password"]', timeout=10000, state="visible")
-                            logging.info("Campos de login detectados")
-                            await page.wait_for_timeout(1000)  # Aguardar um pouco mais para garantir que estão totalmente carregados
-                        except:
-                            logging.warning("Campos de login podem não ter aparecido, continuando mesmo assim...")
-                    elif email_button_clicked is None:
-                        logging.info("Botão 'Continue with email' não encontrado, tentando encontrar campos diretamente...")
-                    
-                    # Tentar múltiplos seletores para o campo de email
-                    email_selectors = [
-                        'input[name="email"]',
-                        'input[type="email"]',
-                        'input[id*="email" i]',
-                        'input[id*="Email" i]',
-                        'input[placeholder*="email" i]',
-                        'input[placeholder*="Email" i]',
-                        'input[placeholder*="e-mail" i]',
-                        'input[placeholder*="E-mail" i]',
-                        'input[autocomplete="email"]',
-                        'input[autocomplete="username"]',
-                        'form input[type="text"]:first-of-type',  # Primeiro input de texto no formulário
-                        'form input:first-of-type',  # Primeiro input no formulário
-                    ]
-                    
-                    email_filled = False
-                    for selector in email_selectors:
-                        try:
-                            email_input = page.locator(selector).first
-                            # Aguardar o elemento aparecer e ficar visível
-                            await email_input.wait_for(state="visible", timeout=5000)
-                            if await email_input.is_visible():
-                                await email_input.click()  # Clicar primeiro para focar
-                                await page.wait_for_timeout(500)
-                                await email_input.fill(self.freepik_creds['email'])
-                                logging.info(f"Email preenchido usando seletor: {selector}")
-                                email_filled = True
-                                break
-                        except Exception as e:
-                            logging.debug(f"Seletor {selector} não funcionou: {e}")
-                            continue
-                    
-                    # Se ainda não encontrou, tentar uma abordagem mais genérica
-                    if not email_filled:
-                        logging.info("Tentando abordagem genérica para encontrar campo de email...")
-                        try:
-                            # Buscar todos os inputs visíveis no formulário
-                            all_inputs = page.locator('form input, input[type="text"], input[type="email"]')
-                            count = await all_inputs.count()
-                            logging.info(f"Encontrados {count} inputs na página")
-                            
-                            # Tentar o primeiro input que não seja senha
-                            for i in range(count):
-                                try:
-                                    input_elem = all_inputs.nth(i)
-                                    if await input_elem.is_visible():
-                                        input_type = await input_elem.get_attribute("type")
-                                        input_name = await input_elem.get_attribute("name")
-                                        input_id = await input_elem.get_attribute("id")
-                                        
-                                        # Se não for senha, tentar preencher como email
-                                        if input_type != "password" and "password" not in (input_name or "").lower() and "password" not in (input_id or "").lower():
-                                            await input_elem.click()
-                                            await page.wait_for_timeout(500)
-                                            await input_elem.fill(self.freepik_creds['email'])
-                                            logging.info(f"Email preenchido no input genérico (tipo: {input_type}, name: {input_name}, id: {input_id})")
-                                            email_filled = True
-                                            break
-                                except:
-                                    continue
-                        except Exception as e:
-                            logging.debug(f"Abordagem genérica falhou: {e}")
-                    
-                    if not email_filled:
-                        logging.error("Não foi possível encontrar o campo de email")
-                        # Debug: salvar screenshot para análise
-                        try:
-                            await page.screenshot(path="freepik_login_debug.png")
-                            logging.info("Screenshot salvo em freepik_login_debug.png para análise")
-                        except:
-                            pass
-                        return False
-                    
-                    # Tentar múltiplos seletores para o campo de senha
-                    password_selectors = [
-                        'input[name="password"]',
-                        'input[type="password"]',
-                        'input[id*="password" i]',
-                        'input[id*="Password" i]',
-                        'input[placeholder*="password" i]',
-                        'input[placeholder*="Password" i]',
-                        'input[placeholder*="senha" i]',
-                        'input[placeholder*="Senha" i]',
-                        'input[autocomplete="current-password"]',
-                        'form input[type="password"]',
-                        'form input[type="password"]:last-of-type',  # Último input de senha no formulário
-                    ]
-                    
-                    password_filled = False
-                    for selector in password_selectors:
-                        try:
-                            password_input = page.locator(selector).first
-                            # Aguardar o elemento aparecer e ficar visível
-                            await password_input.wait_for(state="visible", timeout=5000)
-                            if await password_input.is_visible():
-                                await password_input.click()  # Clicar primeiro para focar
-                                await page.wait_for_timeout(500)
-                                await password_input.fill(self.freepik_creds['password'])
-                                logging.info(f"Senha preenchida usando seletor: {selector}")
-                                password_filled = True
-                                break
-                        except Exception as e:
-                            logging.debug(f"Seletor de senha {selector} não funcionou: {e}")
-                            continue
-                    
-                    # Se ainda não encontrou, tentar uma abordagem mais genérica
-                    if not password_filled:
-                        logging.info("Tentando abordagem genérica para encontrar campo de senha...")
-                        try:
-                            # Buscar todos os inputs de senha
-                            all_password_inputs = page.locator('input[type="password"]')
-                            count = await all_password_inputs.count()
-                            logging.info(f"Encontrados {count} inputs de senha na página")
-                            
-                            if count > 0:
-                                password_input = all_password_inputs.first
-                                if await password_input.is_visible():
-                                    await password_input.click()
-                                    await page.wait_for_timeout(500)
-                                    await password_input.fill(self.freepik_creds['password'])
-                                    logging.info("Senha preenchida no input genérico")
-                                    password_filled = True
-                        except Exception as e:
-                            logging.debug(f"Abordagem genérica de senha falhou: {e}")
-                    
-                    if not password_filled:
-                        logging.error("Não foi possível encontrar o campo de senha")
-                        return False
-                    
-                    # Aguardar um pouco antes de clicar no botão
-                    await page.wait_for_timeout(1000)
-                    
-                    # Tentar múltiplos seletores para o botão de submit
-                    submit_selectors = [
-                        'button[type="submit"]',
-                        'button:has-text("Sign in")',
-                        'button:has-text("Login")',
-                        'button:has-text("Log in")',
-                        'button.btn-primary',
-                        'button[class*="submit"]'
-                    ]
-                    
-                    button_clicked = False
-                    for selector in submit_selectors:
-                        try:
-                            submit_button = page.locator(selector).first
-                            if await submit_button.is_visible(timeout=5000):
-                                await submit_button.click()
-                                logging.info(f"Botão de login clicado usando seletor: {selector}")
-                                button_clicked = True
-                                break
-                        except:
-                            continue
-                    
-                    if not button_clicked:
-                        logging.error("Não foi possível encontrar o botão de login")
-                        return False
-                    
-                    # Aguardar a resposta do login (pode redirecionar ou mostrar erro)
-                    logging.info("Aguardando resposta do login...")
-                    try:
-                        # Aguardar até que a URL mude ou apareça um elemento de sucesso/erro
-                        await page.wait_for_load_state("networkidle", timeout=20000)
-                    except:
-                        pass
-                    
-                    # Aguardar um pouco mais para garantir que a página processou
-                    await page.wait_for_timeout(3000)
-                    
-                    # Verificar se logou com sucesso
-                    current_url = page.url
-                    logging.info(f"URL atual após login: {current_url}")
-                    
-                    # Se não está mais na página de login, provavelmente logou
-                    if "login" not in current_url.lower():
-                        logging.info("Login bem-sucedido - redirecionado para outra página")
-                        return True
-                    
-                    # Verificar se há elementos indicando login bem-sucedido
-                    success_indicators = [
-                        'a[href*="profile"]',
-                        'a[href*="account"]',
-                        'a[href*="dashboard"]',
-                        '[class*="user-menu"]',
-                        '[class*="profile"]',
-                        'button:has-text("Logout")',
-                        'button:has-text("Log out")'
-                    ]
-                    
-                    for indicator in success_indicators:
-                        try:
-                            count = await page.locator(indicator).count()
-                            if count > 0:
-                                logging.info(f"Login bem-sucedido - encontrado indicador: {indicator}")
-                                return True
-                        except:
-                            continue
-                    
-                    # Verificar se há mensagem de erro
-                    error_selectors = [
-                        '.error',
-                        '.alert-danger',
-                        '[class*="error"]',
-                        '[class*="alert"]',
-                        '[role="alert"]'
-                    ]
-                    
-                    for error_selector in error_selectors:
-                        try:
-                            error_elements = page.locator(error_selector)
-                            count = await error_elements.count()
-                            if count > 0:
-                                # Verificar se o elemento está visível e contém texto de erro
-                                for i in range(count):
-                                    element = error_elements.nth(i)
-                                    if await element.is_visible():
-                                        text = await element.text_content()
-                                        if text and len(text.strip()) > 0:
-                                            logging.warning(f"Mensagem de erro encontrada: {text}")
-                                            return False
-                        except:
-                            continue
-                    
-                    # Se ainda está na página de login e não encontrou indicadores de sucesso ou erro,
-                    # considerar como falha
-                    logging.warning("Ainda na página de login sem indicadores claros de sucesso")
-                    return False
-                    
+                    return await self._check_login(page, provider, login, storage_state, started_at)
                 finally:
-                    await browser.close()
+                    if banner_task:
+                        banner_task.cancel()
         except Exception as e:
-            logging.error(f"Erro ao testar login do Freepik: {e}")
+            logging.error(f"Erro ao testar login do {provider}: {e}")
             return False
-    
+
+    async def _check_login(self, page, provider, login, storage_state, started_at):
+        """Sessão salva válida ou, se não, login completo (a sessão nova é salva)"""
+        if storage_state:
+            if await self._session_valid(page, provider):
+                logging.info(f"Sessão salva do {provider} ainda é válida")
+                return True
+            logging.info(f"Sessão salva do {provider} expirada, testando login completo")
+        elif provider == 'freepik':
+            # O login do Freepik parte da página de login já aberta
+            await page.goto(LOGIN_URLS[provider], wait_until="domcontentloaded", timeout=30000)
+        return await self._relogin(provider, page, login, started_at)
+
+    async def test_freepik_login(self):
+        """Testa se o login no Freepik está funcionando"""
+        return await self.test_login('freepik')
+
     async def test_envato_login(self):
         """Testa se o login no Envato está funcionando"""
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = await context.new_page()
-                
-                try:
-                    await page.goto("https://elements.envato.com/sign-in")
-                    await page.fill('#username', self.envato_creds['email'])
-                    await page.fill('#password', self.envato_creds['password'])
-                    await page.click('button[type="submit"]')
-                    await page.wait_for_load_state("networkidle", timeout=10000)
-                    
-                    # Aguardar um pouco para ver se há erro de login
-                    await page.wait_for_timeout(2000)
-                    
-                    # Verificar se ainda está na página de login (erro) ou foi redirecionado (sucesso)
-                    current_url = page.url
-                    if "sign-in" not in current_url.lower() or page.locator('a[href*="profile"], a[href*="account"]').count() > 0:
-                        return True
-                    else:
-                        # Verificar se há mensagem de erro
-                        error_elements = await page.locator('.error, .alert-danger, [class*="error"]').count()
-                        return error_elements == 0
-                finally:
-                    await browser.close()
-        except Exception as e:
-            logging.error(f"Erro ao testar login do Envato: {e}")
-            return False
\ No newline at end of file
+        return await self.test_login('envato')
@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+class DriveLinkCache:
+    """
+    Cache persistente asset -> arquivo já enviado ao Drive (link e MD5).
+
+    Arquivos transmitidos direto ao Drive durante o download não passam pelo
+    disco, então não entram no cache local de downloads nem na deduplicação por
+    MD5 antes do upload. Este cache guarda o MD5 calculado durante a
+    transmissão: um novo pedido do mesmo asset confere se o conteúdo ainda está
+    na pasta e responde com o link, sem baixar nem enviar de novo.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Não foi possível carregar o cache de links do Drive: {e}")
+            return {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar o cache de links do Drive: {e}")
+
+    def get(self, asset_key):
+        """Entrada {'link', 'md5', 'file_name', 'saved_at'} do asset, ou None"""
+        with self._lock:
+            entry = self._entries.get(asset_key)
+            if entry:
+                self.stats['hits'] += 1
+                return dict(entry)
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, asset_key, link, md5, file_name=None):
+        if not link or not md5:
+            return
+        with self._lock:
+            self._entries[asset_key] = {'link': link, 'md5': md5, 'file_name': file_name, 'saved_at': time.time()}
+            self._save()
+
+    def invalidate(self, asset_key):
+        with self._lock:
+            if self._entries.pop(asset_key, None) is not None:
+                self.stats['invalidated'] += 1
+                self._save()
@@ -1,33 +1,390 @@
 import os
+import time
+import asyncio
+import contextvars
 import logging
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaUpload
+import httplib2
+from .upload_journal import UploadJournal
+from .checksums import file_md5
+from .stream_buffer import StreamBuffer
+from .metrics import metrics
+
+class _StreamMedia(MediaUpload):
+    """Adapta um StreamBuffer à interface de mídia do googleapiclient"""
+
+    def __init__(self, stream, file_name, chunk_size):
+        self._stream = stream
+        self._mimetype = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        self._chunk_size = chunk_size
+
+    def chunksize(self):
+        return self._chunk_size
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return self._stream.total
+
+    def resumable(self):
+        return True
+
+    def getbytes(self, begin, length):
+        return self._stream.read_at(begin, length)
+
+    def has_stream(self):
+        return False
+
+
+def _query_upload_status(request, enabled=True):
+    """
+    Com `enabled`, o próximo next_chunk pergunta ao servidor qual foi o último
+    byte recebido (PUT com "Content-Range: bytes */tamanho") antes de enviar dados.
+
+    Depende do atributo privado `_in_error_state` do HttpRequest do
+    google-api-python-client (verificado na 2.116.0, a versão fixada em
+    backend/requirements.txt). Revisar ao atualizar a biblioteca.
+    """
+    request._in_error_state = enabled
+
 
 class DriveService:
-    def __init__(self, credentials_path, folder_id):
+    def __init__(self, credentials_path, folder_id, upload_parallelism=2, folder_cache_ttl=600,
+                 chunk_size=8 * 1024 * 1024, journal_path=None, api_endpoint=None, max_upload_retries=5,
+                 dedupe=True, hash_index_ttl=3600):
         self.credentials_path = credentials_path
         self.folder_id = folder_id
         # Usar escopo mais amplo para acessar arquivos/pastas compartilhados
         self.scopes = ['https://www.googleapis.com/auth/drive']
+        self.credentials = None
+        # Endpoint alternativo da API (ex.: servidor local que imita o Drive em testes)
+        self.client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
         self.service = self._authenticate()
 
+        # Os objetos do googleapiclient (e o httplib2 por baixo) não são thread-safe:
+        # cada thread de upload usa o seu próprio cliente autorizado
+        self._thread_local = threading.local()
+        self._service_thread = threading.current_thread()
+        self.upload_parallelism = max(1, upload_parallelism)
+        self._upload_executor = None
+
+        # Cache dos metadados da pasta de destino e contadores de chamadas à API
+        self.folder_cache_ttl = folder_cache_ttl
+        self._folder_cache = None
+        self._folder_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'uploads': 0, 'api_calls': 0, 'deduplicated': 0}
+
+        # Índice md5Checksum -> arquivo já existente na pasta, para não reenviar
+        # conteúdo idêntico. Carregado da própria pasta e atualizado a cada upload.
+        self.dedupe = dedupe
+        self.hash_index_ttl = hash_index_ttl
+        self._hash_index = None
+        self._hash_index_at = 0
+        self._hash_lock = threading.Lock()
+
+        # Upload em chunks (múltiplo de 256KB exigido pela API) com diário para retomada
+        self.chunk_size = max(256 * 1024, chunk_size // (256 * 1024) * (256 * 1024))
+        self.max_upload_retries = max_upload_retries
+        self.journal = UploadJournal(journal_path)
+
     def _authenticate(self):
         if not os.path.exists(self.credentials_path):
             logging.warning(f"Arquivo de credenciais do Google não encontrado em: {self.credentials_path}")
             return None
         
         try:
-            creds = service_account.Credentials.from_service_account_file(
+            self.credentials = service_account.Credentials.from_service_account_file(
                 self.credentials_path, scopes=self.scopes
             )
-            return build('drive', 'v3', credentials=creds)
+            return build('drive', 'v3', credentials=self.credentials, client_options=self.client_options)
         except Exception as e:
             logging.error(f"Erro na autenticação do Google Drive: {e}")
             return None
 
-    def upload_file(self, file_path):
-        if not self.service:
+    def _get_service(self):
+        """Cliente do Drive exclusivo da thread atual"""
+        if threading.current_thread() is self._service_thread:
+            return self.service
+        service = getattr(self._thread_local, 'service', None)
+        if service is None and self.credentials is not None:
+            service = build(
+                'drive', 'v3', credentials=self.credentials,
+                client_options=self.client_options, cache_discovery=False
+            )
+            self._thread_local.service = service
+        return service
+
+    async def upload_file_async(self, file_path, md5=None):
+        """
+        Versão assíncrona do upload_file: roda em um pool de threads dedicado
+        para não travar o event loop durante uploads grandes.
+        """
+        loop = asyncio.get_running_loop()
+        # copy_context: as métricas do upload levam o ID do job que o originou
+        return await loop.run_in_executor(
+            self._get_executor(), contextvars.copy_context().run, self.upload_file, file_path, md5
+        )
+
+    async def find_existing_async(self, md5):
+        """
+        Link de um arquivo da pasta de destino com o conteúdo `md5`, ou None.
+        Permite responder com o arquivo já enviado antes de baixar o asset de novo.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), contextvars.copy_context().run, self.find_existing, md5
+        )
+
+    def find_existing(self, md5):
+        """Versão síncrona de find_existing_async; erros da API são propagados"""
+        service = self._get_service()
+        if not service or not self.dedupe or not self.folder_id or not md5:
+            return None
+        folder_info = self._get_folder_info(service)
+        return self._existing_link(service, md5, folder_info)
+
+    def _get_executor(self):
+        if self._upload_executor is None:
+            self._upload_executor = ThreadPoolExecutor(
+                max_workers=self.upload_parallelism, thread_name_prefix='drive-upload'
+            )
+        return self._upload_executor
+
+    def close(self):
+        """Encerra o pool de threads de upload (aguarda os uploads em andamento)"""
+        if self._upload_executor is not None:
+            self._upload_executor.shutdown(wait=True)
+            self._upload_executor = None
+
+    def _execute(self, request, api_calls=None):
+        """Executa uma requisição da API contabilizando a chamada"""
+        with self._stats_lock:
+            self.stats['api_calls'] += 1
+        if api_calls is not None:
+            api_calls[0] += 1
+        with metrics.stage('drive_api', method=getattr(request, 'methodId', None)):
+            return request.execute()
+
+    def _get_folder_info(self, service, api_calls=None):
+        """
+        Metadados da pasta de destino (nome, Shared Drive e se é pública), com cache
+        por `folder_cache_ttl` segundos. Erros de acesso não são guardados no cache.
+        """
+        with self._folder_lock:
+            cached = self._folder_cache
+            if cached and time.monotonic() - cached['fetched_at'] < self.folder_cache_ttl:
+                return cached
+
+        folder = self._execute(service.files().get(
+            fileId=self.folder_id,
+            fields='id, name, driveId, permissions(type, role)',
+            supportsAllDrives=True
+        ), api_calls)
+        info = {
+            'name': folder.get('name', 'N/A'),
+            'drive_id': folder.get('driveId'),
+            'public': any(p.get('type') == 'anyone' for p in folder.get('permissions', [])),
+            'fetched_at': time.monotonic(),
+        }
+        logging.info(f"Acesso à pasta confirmado: {info['name']}")
+        # Se tem driveId, está em um Shared Drive (funciona com Service Account)
+        if info['drive_id']:
+            logging.info(f"Pasta está em um Shared Drive (ID: {info['drive_id']})")
+
+        with self._folder_lock:
+            self._folder_cache = info
+        return info
+
+    def _load_hash_index(self, service, folder_info, api_calls=None):
+        """Lista os arquivos da pasta de destino com o md5Checksum de cada um"""
+        params = {
+            'q': f"'{self.folder_id}' in parents and trashed = false",
+            'fields': 'nextPageToken, files(id, md5Checksum, webViewLink)',
+            'pageSize': 1000,
+            'supportsAllDrives': True,
+            'includeItemsFromAllDrives': True,
+        }
+        if folder_info and folder_info.get('drive_id'):
+            params.update(corpora='drive', driveId=folder_info['drive_id'])
+
+        index = {}
+        page_token = None
+        while True:
+            response = self._execute(service.files().list(pageToken=page_token, **params), api_calls)
+            for item in response.get('files', []):
+                if item.get('md5Checksum'):
+                    # Arquivos que não foram enviados por nós podem não ser públicos ainda
+                    index[item['md5Checksum']] = {'id': item['id'], 'link': item.get('webViewLink'), 'shared': False}
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return index
+
+    def _find_duplicate(self, service, md5, folder_info, api_calls=None):
+        """Arquivo da pasta com o mesmo conteúdo (mesmo MD5), ou None"""
+        with self._hash_lock:
+            if self._hash_index is None or time.monotonic() - self._hash_index_at > self.hash_index_ttl:
+                # Dentro do lock: uploads simultâneos esperam uma única listagem
+                self._hash_index = self._load_hash_index(service, folder_info, api_calls)
+                self._hash_index_at = time.monotonic()
+                logging.info(f"Índice de conteúdo da pasta carregado: {len(self._hash_index)} arquivo(s)")
+            entry = self._hash_index.get(md5)
+            return dict(entry) if entry else None
+
+    def _remember_file(self, md5, file_id, link, shared=True):
+        with self._hash_lock:
+            if self._hash_index is not None and md5:
+                self._hash_index[md5] = {'id': file_id, 'link': link, 'shared': shared}
+
+    def _existing_link(self, service, md5, folder_info, api_calls=None):
+        """Link do arquivo da pasta com o mesmo conteúdo, já público, ou None"""
+        existing = self._find_duplicate(service, md5, folder_info, api_calls)
+        if not existing or not existing.get('link'):
+            return None
+        logging.info(f"Conteúdo já existe no Drive (ID: {existing['id']}), upload dispensado")
+        if not existing['shared'] and not folder_info.get('public'):
+            self._make_public(service, existing['id'], folder_info.get('drive_id'), api_calls)
+        self._remember_file(md5, existing['id'], existing['link'])
+        with self._stats_lock:
+            self.stats['deduplicated'] += 1
+        return existing['link']
+
+    def _make_public(self, service, file_id, shared_drive, api_calls=None):
+        """Permite que qualquer pessoa com o link leia o arquivo"""
+        # Para Shared Drives, usar 'reader' em vez de 'viewer'
+        try:
+            role = 'reader' if shared_drive else 'viewer'
+            
+            self._execute(service.permissions().create(
+                fileId=file_id,
+                body={'type': 'anyone', 'role': role},
+                supportsAllDrives=True
+            ), api_calls)
+            logging.info(f"Permissão pública configurada para o arquivo (role: {role})")
+        except Exception as e:
+            logging.warning(f"Não foi possível configurar permissão pública (arquivo já pode estar acessível): {e}")
+
+    def _resumable_create(self, service, media, file_metadata, api_calls=None, journal_key=None,
+                          expected_md5=None):
+        """
+        Envia `media` em chunks de `chunk_size` bytes pelo protocolo resumable.
+
+        Com `journal_key`, a URI da sessão e o último byte confirmado ficam no
+        diário em disco: após uma falha transitória ou um reinício do processo, o
+        upload continua do último byte confirmado pelo servidor. Um upload
+        retomado só é aceito se o md5Checksum devolvido pelo Drive for igual a
+        `expected_md5`; senão o arquivo é apagado e o envio recomeça do zero.
+        """
+        file_name = file_metadata['name']
+        size = media.size()
+        request = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, webViewLink, driveId, md5Checksum',
+            supportsAllDrives=True
+        )
+        with self._stats_lock:
+            self.stats['api_calls'] += 1
+        if api_calls is not None:
+            api_calls[0] += 1
+
+        entry = self.journal.get(journal_key) if journal_key else None
+        resumed = bool(entry and entry.get('size') == size)
+        if resumed:
+            # Retoma a sessão: o cliente pergunta ao servidor qual foi o último
+            # byte recebido antes de enviar o próximo chunk. O nome do arquivo no
+            # Drive é o da sessão original, mesmo que a cópia local tenha outro nome.
+            request.resumable_uri = entry['uri']
+            request.resumable_progress = entry['offset']
+            _query_upload_status(request)
+            file_name = entry.get('name') or file_name
+            logging.info(f"Retomando upload de {file_name} a partir de {entry['offset'] / 1024 / 1024:.2f}MB")
+
+        started = time.monotonic()
+        start_offset = request.resumable_progress
+        failures = 0
+        response = None
+        while response is None:
+            try:
+                # Sem as novas tentativas internas do googleapiclient: com MediaFileUpload
+                # elas reenviam um chunk cujo stream já foi lido (corpo vazio). Este laço
+                # repete a partir do último byte confirmado pelo servidor.
+                status, response = request.next_chunk(num_retries=0)
+            except HttpError as e:
+                if e.resp.status in (404, 410) and request.resumable_uri and journal_key:
+                    # Sessão expirada no servidor: recomeça do zero
+                    logging.warning(f"Sessão de upload expirada para {file_name}, recomeçando")
+                    self.journal.finish(journal_key)
+                    request.resumable_uri = None
+                    request.resumable_progress = 0
+                    _query_upload_status(request, False)
+                    start_offset = 0
+                    resumed = False
+                    continue
+                if e.resp.status < 500 and e.resp.status != 429:
+                    raise
+                failures += 1
+                if failures > self.max_upload_retries:
+                    raise
+                logging.warning(f"Erro transitório no upload de {file_name} ({e.resp.status}), tentando novamente")
+                time.sleep(min(2 ** failures, 30))
+                continue
+            except (OSError, httplib2.HttpLib2Error) as e:
+                failures += 1
+                if failures > self.max_upload_retries or not request.resumable_uri:
+                    raise
+                logging.warning(f"Falha de rede no upload de {file_name} ({e}), retomando")
+                _query_upload_status(request)
+                time.sleep(min(2 ** failures, 30))
+                continue
+
+            if status:
+                failures = 0
+                if journal_key:
+                    if not self.journal.get(journal_key):
+                        self.journal.start(journal_key, request.resumable_uri, size, file_name)
+                    self.journal.update(journal_key, status.resumable_progress)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                rate = (status.resumable_progress - start_offset) / elapsed
+                logging.info(
+                    f"Upload de {file_name}: {status.progress() * 100:.0f}% "
+                    f"({rate / 1024 / 1024:.2f}MB/s)"
+                )
+
+        if journal_key:
+            self.journal.finish(journal_key)
+        if resumed and expected_md5 and response.get('md5Checksum') not in (None, expected_md5):
+            # A sessão retomada não era deste conteúdo: o arquivo no Drive está corrompido
+            logging.error(
+                f"MD5 do upload retomado de {file_name} não confere "
+                f"({response.get('md5Checksum')} != {expected_md5}), enviando de novo"
+            )
+            try:
+                self._execute(service.files().delete(fileId=response['id'], supportsAllDrives=True), api_calls)
+            except Exception as e:
+                logging.warning(f"Não foi possível apagar o arquivo corrompido {response.get('id')}: {e}")
+            return self._resumable_create(service, media, file_metadata, api_calls, journal_key, expected_md5)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        logging.info(f"Upload de {file_name} concluído em {elapsed:.1f}s ({(size - start_offset) / elapsed / 1024 / 1024:.2f}MB/s)")
+        return response
+
+    def upload_file(self, file_path, md5=None):
+        """
+        Envia o arquivo para a pasta do Drive e retorna o link.
+
+        Se a pasta já tiver um arquivo com o mesmo conteúdo, retorna o link dele
+        sem enviar nada. `md5` pode vir do download (calculado durante a gravação);
+        sem ele, o hash é calculado aqui.
+        """
+        service = self._get_service()
+        if not service:
             logging.error("Serviço do Google Drive não disponível.")
             return None
 
@@ -35,24 +392,64 @@ class DriveService:
             logging.error(f"Arquivo local não encontrado para upload: {file_path}")
             return None
 
-        file_name = os.path.basename(file_path)
+        # O MD5 identifica a sessão no diário (retomada só com o mesmo conteúdo),
+        # serve à deduplicação e confere o upload retomado
+        md5 = md5 or file_md5(file_path)
+        media = MediaFileUpload(file_path, chunksize=self.chunk_size, resumable=True)
+        return self._upload(
+            service, os.path.basename(file_path), media, md5=md5,
+            journal_key=f"{os.path.getsize(file_path)}:{md5}"
+        )
+
+    async def open_stream(self, file_name, total, buffer_size=32 * 1024 * 1024):
+        """
+        Inicia um upload alimentado enquanto o arquivo ainda está sendo baixado.
+
+        Retorna o StreamBuffer que o download deve preencher e a future com o
+        link do Drive. No máximo `buffer_size` bytes ficam em memória.
+        """
+        # O buffer precisa comportar ao menos um chunk inteiro, senão produtor e
+        # consumidor ficariam esperando um pelo outro
+        stream = StreamBuffer(total, max(buffer_size, 2 * self.chunk_size))
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._get_executor(), contextvars.copy_context().run, self.upload_stream, stream, file_name
+        )
+        return stream, future
+
+    def upload_stream(self, stream, file_name):
+        """Envia para o Drive os bytes que chegam em `stream` e retorna o link"""
+        service = self._get_service()
+        if not service:
+            logging.error("Serviço do Google Drive não disponível.")
+            stream.fail(RuntimeError("Google Drive não disponível"))
+            return None
+
+        link = self._upload(service, file_name, _StreamMedia(stream, file_name, self.chunk_size))
+        if not link:
+            # Libera o download, que estaria esperando espaço no buffer
+            stream.fail(RuntimeError("upload para o Drive falhou"))
+        return link
+
+    def _upload(self, service, file_name, media, md5=None, journal_key=None):
+        """
+        Cria o arquivo na pasta de destino, deixa-o público e retorna o link.
+        Com `md5`, consulta antes se a pasta já tem o mesmo conteúdo.
+        """
         file_metadata = {
             'name': file_name,
             'parents': [self.folder_id] if self.folder_id else []
         }
         
-        media = MediaFileUpload(file_path, resumable=True)
+        api_calls = [0]  # Chamadas à API feitas por este upload
         
         try:
             # Verificar se tem acesso à pasta antes de fazer upload
+            # (metadados da pasta ficam em cache, sem uma chamada por arquivo)
+            folder_info = None
             if self.folder_id:
                 try:
-                    folder_info = self.service.files().get(
-                        fileId=self.folder_id,
-                        fields='id, name, permissions',
-                        supportsAllDrives=True
-                    ).execute()
-                    logging.info(f"Acesso à pasta confirmado: {folder_info.get('name', 'N/A')}")
+                    folder_info = self._get_folder_info(service, api_calls)
                 except Exception as e:
                     error_msg = str(e).lower()
                     if 'permission denied' in error_msg or 'insufficient permissions' in error_msg:
@@ -64,63 +461,39 @@ class DriveService:
                     else:
                         logging.error(f"Erro ao verificar acesso à pasta: {e}")
                     return None
+
+            # Conteúdo idêntico já está na pasta: reaproveita o arquivo existente
+            if self.dedupe and self.folder_id and md5:
+                try:
+                    existing_link = self._existing_link(service, md5, folder_info, api_calls)
+                except Exception as e:
+                    logging.warning(f"Não foi possível consultar arquivos existentes na pasta: {e}")
+                    existing_link = None
+                if existing_link:
+                    return existing_link
             
             # Upload do arquivo na pasta compartilhada
             # Usa supportsAllDrives=True para funcionar com pastas compartilhadas e Shared Drives
-            # Verificar se a pasta está em um Shared Drive
-            try:
-                folder_info = self.service.files().get(
-                    fileId=self.folder_id,
-                    fields='id, name, driveId',
-                    supportsAllDrives=True
-                ).execute()
-                
-                # Se tem driveId, está em um Shared Drive (funciona com Service Account)
-                if folder_info.get('driveId'):
-                    logging.info(f"Pasta está em um Shared Drive (ID: {folder_info.get('driveId')})")
-            except:
-                pass
-            
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, webViewLink',
-                supportsAllDrives=True
-            ).execute()
+            # O link e o driveId já voltam na resposta do create
+            with metrics.stage('drive_resumable_upload'):
+                file = self._resumable_create(service, media, file_metadata, api_calls, journal_key, md5)
+            metrics.inc('bytes_total', media.size() or 0, direction='upload', provider='drive')
             
             file_id = file.get('id')
             logging.info(f"Arquivo enviado com sucesso. ID: {file_id}")
 
             # Alterar permissão para "qualquer pessoa com o link pode ler"
-            # Para Shared Drives, usar 'reader' em vez de 'viewer'
-            try:
-                # Verificar se está em Shared Drive
-                file_info_check = self.service.files().get(
-                    fileId=file_id,
-                    fields='driveId',
-                    supportsAllDrives=True
-                ).execute()
-                
-                # Se está em Shared Drive, usar 'reader', senão 'viewer'
-                role = 'reader' if file_info_check.get('driveId') else 'viewer'
-                
-                self.service.permissions().create(
-                    fileId=file_id,
-                    body={'type': 'anyone', 'role': role},
-                    supportsAllDrives=True
-                ).execute()
-                logging.info(f"Permissão pública configurada para o arquivo (role: {role})")
-            except Exception as e:
-                logging.warning(f"Não foi possível configurar permissão pública (arquivo já pode estar acessível): {e}")
-
-            # Obter o link de compartilhamento final
-            file_info = self.service.files().get(
-                fileId=file_id,
-                fields='webViewLink',
-                supportsAllDrives=True
-            ).execute()
+            # Desnecessário quando a pasta já é pública: o arquivo herda a permissão
+            if folder_info and folder_info.get('public'):
+                logging.info("Pasta já é pública, permissão herdada pelo arquivo")
+            else:
+                self._make_public(service, file_id, file.get('driveId'), api_calls)
+            self._remember_file(file.get('md5Checksum') or md5, file_id, file.get('webViewLink'))
 
-            return file_info.get('webViewLink')
+            logging.info(f"Upload concluído com {api_calls[0]} chamada(s) à API do Drive")
+            with self._stats_lock:
+                self.stats['uploads'] += 1
+            return file.get('webViewLink')
 
         except Exception as e:
             error_msg = str(e).lower()
@@ -156,7 +529,9 @@ class DriveService:
     
     def test_connection(self):
         """Testa a conexão com o Google Drive e verifica permissões"""
-        if not self.service:
+        # Roda no executor padrão do loop: usa o cliente da thread, não o compartilhado
+        service = self._get_service()
+        if not service:
             return False
         
         # Obter o e-mail da Conta de Serviço para mensagens de erro
@@ -172,7 +547,7 @@ class DriveService:
         try:
             if self.folder_id:
                 # Verifica se consegue acessar a pasta e tem permissões
-                folder_info = self.service.files().get(
+                folder_info = service.files().get(
                     fileId=self.folder_id,
                     fields='id, name, permissions',
                     supportsAllDrives=True
@@ -181,7 +556,7 @@ class DriveService:
                 
                 # Tenta verificar se tem permissão de escrita tentando listar arquivos na pasta
                 # (isso não cria nada, apenas verifica permissões)
-                self.service.files().list(
+                service.files().list(
                     q=f"'{self.folder_id}' in parents",
                     pageSize=1,
                     fields='files(id, name)',
@@ -192,7 +567,7 @@ class DriveService:
                 return True
             else:
                 # Se não tem pasta configurada, apenas verifica se o serviço está funcionando
-                self.service.files().list(pageSize=1).execute()
+                service.files().list(pageSize=1).execute()
                 logging.info("✅ Conexão com Google Drive OK (sem pasta específica)")
                 return True
         except Exception as e:
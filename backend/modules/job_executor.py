@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+
+class JobExecutor:
+    """
+    Executa vários jobs de download/upload ao mesmo tempo no event loop.
+
+    Além do limite global de jobs simultâneos, cada recurso externo (Freepik,
+    Envato, uploads do Drive) tem o seu próprio limite, aplicado com
+    `async with executor.limit('freepik'):` na etapa correspondente.
+    """
+
+    def __init__(self, max_jobs=8, limits=None):
+        self.max_jobs = max_jobs
+        self.limits = dict(limits or {})
+        # Semáforos criados sob demanda, dentro do event loop que os usa
+        self._semaphores = {}
+        self._tasks = set()
+        self.stats = {'submitted': 0, 'running': 0, 'completed': 0, 'failed': 0}
+
+    def _semaphore(self, name):
+        if name == 'jobs':
+            max_value = self.max_jobs
+        else:
+            max_value = self.limits.get(name)
+        if not max_value or max_value <= 0:
+            return None  # Sem limite configurado
+
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max_value)
+            self._semaphores[name] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def limit(self, name):
+        """Limita quantas tarefas usam o recurso `name` ao mesmo tempo"""
+        semaphore = self._semaphore(name)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+    async def acquire(self, name):
+        """
+        Ocupa uma vaga de `name` fora de um bloco `async with` (ex.: até uma
+        future terminar). Retorna a função que libera a vaga.
+        """
+        semaphore = self._semaphore(name)
+        if semaphore is None:
+            return lambda: None
+        await semaphore.acquire()
+        return semaphore.release
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    def submit(self, job_fn, *args, **kwargs):
+        """Agenda um job e retorna a Task (deve ser chamado dentro do event loop)"""
+        self.stats['submitted'] += 1
+        task = asyncio.ensure_future(self._run(job_fn, *args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, job_fn, *args, **kwargs):
+        async with self.limit('jobs'):
+            self.stats['running'] += 1
+            try:
+                result = await job_fn(*args, **kwargs)
+            except Exception:
+                self.stats['failed'] += 1
+                raise
+            else:
+                self.stats['completed'] += 1
+                return result
+            finally:
+                self.stats['running'] -= 1
+
+    async def shutdown(self, timeout=30):
+        """Aguarda os jobs em andamento e cancela os que não terminarem a tempo"""
+        if not self._tasks:
+            return
+        logging.info(f"Aguardando {len(self._tasks)} job(s) em andamento...")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning(f"{len(pending)} job(s) cancelado(s) no encerramento")
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+-- Próximo job da fila: filtra e ordena só pelo índice, sem varrer a tabela
+CREATE INDEX IF NOT EXISTS idx_jobs_dequeue ON jobs (queue, state, available_at, id);
+-- Leases vencidas (workers que caíram)
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (state, lease_expires);
+"""
+
+
+class JobStore:
+    """
+    Fila de jobs persistente em SQLite (modo WAL), sobrevive a quedas e reinícios.
+
+    Cada job passa por queued -> running -> done/failed. Ao ser pego por um worker
+    (`claim`), o job recebe uma lease com prazo; se o worker cair e a lease vencer,
+    o job volta para a fila (até `max_attempts` tentativas). Várias filas
+    (ex.: 'gui' e 'telegram') compartilham o mesmo arquivo.
+    """
+
+    def __init__(self, db_path, lease_seconds=300, retention_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._next_purge = 0.0
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Uma conexão compartilhada, serializada pelo lock (threads da GUI, do bot e do backend)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Com WAL, NORMAL só sincroniza no checkpoint: seguro contra queda do processo
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else None
+        return job
+
+    def enqueue(self, queue, url, payload=None, max_attempts=3):
+        """Adiciona um job à fila e retorna o ID"""
+        return self.enqueue_many(queue, [url], payload=payload, max_attempts=max_attempts)[0]
+
+    def enqueue_many(self, queue, urls, payload=None, max_attempts=3):
+        """Adiciona vários jobs em uma única transação e retorna os IDs"""
+        now = time.time()
+        data = json.dumps(payload) if payload is not None else None
+        ids = []
+        with self._lock, self._transaction():
+            for url in urls:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (queue, url, payload, max_attempts, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (queue, url, data, max_attempts, now, now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self, queue, owner, lease_seconds=None):
+        """
+        Pega o próximo job disponível da fila para `owner`, com lease.
+        Retorna o job (dict) ou None se a fila estiver vazia.
+        """
+        now = time.time()
+        lease = lease_seconds or self.lease_seconds
+        with self._lock, self._transaction():
+            self._expire_leases(queue, now)
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE queue = ? AND state = ? AND available_at <= ? "
+                "ORDER BY available_at, id LIMIT 1",
+                (queue, QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now + lease, now, row['id'])
+            )
+        job = self._row(row)
+        job.update(state=RUNNING, attempts=job['attempts'] + 1, lease_owner=owner, lease_expires=now + lease)
+        return job
+
+    def _expire_leases(self, queue, now):
+        """Devolve à fila (ou falha, se esgotou as tentativas) os jobs com lease vencida"""
+        expired = self._conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+            "error = CASE WHEN attempts < max_attempts THEN error ELSE 'lease expirada' END, "
+            "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_expires < ? AND queue = ?",
+            (QUEUED, FAILED, now, RUNNING, now, queue)
+        ).rowcount
+        if expired:
+            logging.warning(f"{expired} job(s) da fila '{queue}' com lease vencida foram recuperados")
+
+    def recover(self, queue):
+        """
+        Devolve à fila todos os jobs 'running' da fila. Usado na inicialização:
+        o processo anterior caiu com esses jobs em andamento.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            recovered = self._conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE queue = ? AND state = ?",
+                (QUEUED, FAILED, now, queue, RUNNING)
+            ).rowcount
+        if recovered:
+            logging.info(f"{recovered} job(s) interrompido(s) da fila '{queue}' recuperado(s)")
+        return recovered
+
+    def heartbeat(self, job_id, owner, lease_seconds=None):
+        """Renova a lease de um job em andamento. Retorna False se a lease foi perdida."""
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND state = ?",
+                (now + (lease_seconds or self.lease_seconds), now, job_id, owner, RUNNING)
+            ).rowcount == 1
+
+    async def hold_lease(self, job_id, owner, lease_seconds=None):
+        """Renova a lease periodicamente enquanto o job roda (cancele ao terminar)"""
+        lease = lease_seconds or self.lease_seconds
+        while True:
+            await asyncio.sleep(lease / 3)
+            if not self.heartbeat(job_id, owner, lease):
+                logging.warning(f"Lease do job {job_id} perdida")
+                return
+
+    def complete(self, job_id, result=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (DONE, result, now, job_id)
+            )
+
+    def fail(self, job_id, error=None, retry_delay=None):
+        """
+        Marca o job como falho. Com `retry_delay`, volta para a fila após esse
+        intervalo enquanto ainda houver tentativas.
+        """
+        now = time.time()
+        with self._lock:
+            if retry_delay is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+                    "available_at = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (QUEUED, FAILED, now + retry_delay, error, now, job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, lease_expires = NULL, "
+                    "updated_at = ? WHERE id = ?",
+                    (FAILED, error, now, job_id)
+                )
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def count(self, queue, state=QUEUED):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND state = ?", (queue, state)
+            ).fetchone()[0]
+
+    def position(self, job_id):
+        """Posição do job na fila (1 = próximo), ou 0 se não está mais aguardando"""
+        with self._lock:
+            row = self._conn.execute("SELECT queue, state, available_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['state'] != QUEUED:
+                return 0
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND state = ? AND "
+                "(available_at < ? OR (available_at = ? AND id <= ?))",
+                (row['queue'], QUEUED, row['available_at'], row['available_at'], job_id)
+            ).fetchone()[0]
+
+    def pending(self, queue):
+        """Jobs ainda não concluídos da fila (aguardando ou em andamento), em ordem"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE queue = ? AND state IN (?, ?) ORDER BY id",
+                (queue, QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def clear(self, queue):
+        """Remove os jobs que ainda aguardam na fila e retorna quantos foram removidos"""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE queue = ? AND state = ?", (queue, QUEUED)
+            ).rowcount
+
+    def purge(self, older_than=None):
+        """Apaga jobs concluídos ou falhos mais antigos que `older_than` segundos (padrão: retenção)"""
+        if older_than is None:
+            older_than = self.retention_seconds
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than)
+            ).rowcount
+
+    def purge_expired(self, interval=3600):
+        """
+        Roda o purge no máximo uma vez a cada `interval` segundos. Chamado pelos
+        workers com a fila vazia: o histórico não cresce sem limite em processos longos.
+        """
+        now = time.monotonic()
+        if now < self._next_purge:
+            return 0
+        self._next_purge = now + interval
+        try:
+            removed = self.purge()
+        except sqlite3.Error as e:
+            logging.warning(f"Não foi possível limpar o histórico de jobs: {e}")
+            return 0
+        if removed:
+            logging.info(f"{removed} job(s) antigo(s) removido(s) do histórico")
+        return removed
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE / COMMIT (ROLLBACK em caso de erro) na conexão em modo autocommit"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        # IMMEDIATE: reserva a escrita já no início, evitando que dois processos
+        # leiam o mesmo job como disponível
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
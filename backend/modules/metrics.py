@@ -0,0 +1,207 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (s) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Tipo e descrição de cada métrica exportada
+DESCRIPTIONS = {
+    'stage_seconds': ('histogram', 'Duração de cada etapa de um job (segundos)'),
+    'jobs_total': ('counter', 'Jobs processados por provedor e resultado'),
+    'bytes_total': ('counter', 'Bytes baixados e enviados'),
+}
+
+# ID do job em andamento: correlaciona as linhas de log estruturado de um mesmo job.
+# Propaga para as tasks criadas dentro do job; threads precisam de copy_context().
+current_job_id = contextvars.ContextVar('job_id', default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+
+
+class _Stage:
+    """Etapa em andamento; `outcome` pode ser trocado para 'failed' pelo código medido"""
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+
+class Metrics:
+    """
+    Contadores e histogramas de latência por etapa dos jobs.
+
+    Exportados no formato de texto do Prometheus (`render` / `serve`) e, se
+    habilitado, também como uma linha JSON por etapa com o ID do job
+    (`enable_json_log`). Pode ser usado de qualquer thread.
+    """
+
+    def __init__(self, prefix='automation', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._server = None
+        self.json_logs = False
+        self.logger = logging.getLogger('automation.metrics')
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def event(self, event, **fields):
+        """Linha de log estruturado (JSON) com o ID do job atual"""
+        if not self.json_logs:
+            return
+        record = {'ts': round(time.time(), 3), 'event': event, 'job_id': current_job_id.get()}
+        record.update(fields)
+        self.logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Mede a duração do bloco como a etapa `name` (resultado 'error' se houver exceção)"""
+        stage = _Stage()
+        start = time.perf_counter()
+        try:
+            yield stage
+        except Exception:
+            stage.outcome = 'error'
+            raise
+        except BaseException:
+            stage.outcome = 'cancelled'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('stage_seconds', elapsed, stage=name, outcome=stage.outcome, **labels)
+            self.event('stage', stage=name, seconds=round(elapsed, 3), outcome=stage.outcome, **labels)
+
+    @contextmanager
+    def job(self, provider, job_id=None):
+        """Etapa 'job' inteira, com um novo ID de correlação para tudo o que rodar dentro dela"""
+        token = current_job_id.set(job_id or uuid.uuid4().hex[:12])
+        try:
+            with self.stage('job', provider=provider) as stage:
+                yield stage
+        finally:
+            self.inc('jobs_total', provider=provider, outcome=stage.outcome)
+            current_job_id.reset(token)
+
+    def enable_json_log(self, path):
+        """Grava as linhas JSON em `path` (uma por linha), fora do log de texto"""
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.json_logs = True
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            (k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs
+        )
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+    def render(self):
+        """Todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, text = DESCRIPTIONS.get(name, ('untyped', name))
+                lines.append(f"# HELP {self.prefix}_{name} {text}")
+                lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{self.prefix}_{name}{self._labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.prefix}_{name}_bucket{self._labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{self.prefix}_{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.prefix}_{name}_sum{self._labels(labels)} {total:.6f}")
+            lines.append(f"{self.prefix}_{name}_count{self._labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expõe GET /metrics em uma thread em segundo plano (idempotente)"""
+        if self._server is not None:
+            return self._server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info(f"Métricas disponíveis em http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Registro compartilhado pelo processo (downloader, Drive e fluxo principal)
+metrics = Metrics()
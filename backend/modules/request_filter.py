@@ -0,0 +1,136 @@
+import logging
+import threading
+from urllib.parse import urlparse
+
+# Domínios de analytics/ads/rastreamento que nunca são necessários para logar ou baixar
+TRACKER_DOMAINS = {
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com',
+    'googlesyndication.com', 'doubleclick.net', 'facebook.net', 'facebook.com',
+    'hotjar.com', 'hotjar.io', 'clarity.ms', 'bat.bing.com', 'segment.io',
+    'segment.com', 'amplitude.com', 'mixpanel.com', 'nr-data.net',
+    'newrelic.com', 'criteo.com', 'criteo.net', 'taboola.com', 'outbrain.com',
+    'adnxs.com', 'tiktok.com', 'snapchat.com', 'pinterest.com', 'linkedin.com',
+    'licdn.com', 'twitter.com', 'ads-twitter.com', 'quantserve.com',
+    'scorecardresearch.com', 'optimizely.com', 'fullstory.com',
+}
+
+# Domínios liberados mesmo que o tipo de recurso esteja bloqueado
+# (captcha e provedores de login precisam carregar por completo)
+ALWAYS_ALLOWED_DOMAINS = {
+    'recaptcha.net', 'google.com', 'gstatic.com', 'hcaptcha.com',
+    'challenges.cloudflare.com', 'accounts.google.com',
+}
+
+DEFAULT_RULES = {
+    'freepik': {
+        'block_types': {'image', 'font', 'media'},
+        'deny_domains': TRACKER_DOMAINS,
+        'allow_domains': ALWAYS_ALLOWED_DOMAINS,
+    },
+    'envato': {
+        'block_types': {'image', 'font', 'media'},
+        'deny_domains': TRACKER_DOMAINS,
+        'allow_domains': ALWAYS_ALLOWED_DOMAINS,
+    },
+}
+
+
+def _matches_domain(host, domains):
+    """Verifica se o host é um dos domínios (ou subdomínio deles)"""
+    host = host.lower()
+    while host:
+        if host in domains:
+            return True
+        if '.' not in host:
+            return False
+        host = host.split('.', 1)[1]
+    return False
+
+
+class RequestFilter:
+    """
+    Bloqueia, via `context.route`, as requisições que não são necessárias para
+    logar e clicar em Download: imagens, fontes, vídeos de preview e scripts de
+    analytics/ads. As regras são por provedor (lista de permissão e de bloqueio).
+
+    Requisições abortadas não chegam ao servidor, então o tamanho delas nunca é
+    conhecido (descobri-lo exigiria uma requisição extra por recurso bloqueado).
+    Os contadores registram as requisições bloqueadas (por tipo) e os bytes que
+    efetivamente trafegaram: a economia é a diferença de `loaded_bytes` entre
+    execuções com e sem BLOCK_REQUESTS.
+    """
+
+    def __init__(self, enabled=True, block_types=None, rules=None):
+        self.enabled = enabled
+        self.rules = {provider: dict(rule) for provider, rule in (rules or DEFAULT_RULES).items()}
+        if block_types is not None:
+            for rule in self.rules.values():
+                rule['block_types'] = set(block_types)
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def _stats(self, provider):
+        return self.stats.setdefault(provider, {
+            'requests': 0,
+            'blocked_requests': 0,
+            'blocked_by_type': {},
+            'loaded_bytes': 0,
+        })
+
+    def should_block(self, provider, url, resource_type):
+        rule = self.rules.get(provider)
+        if not rule:
+            return False
+        host = urlparse(url).hostname or ''
+        if _matches_domain(host, rule.get('allow_domains', ())):
+            return False
+        if _matches_domain(host, rule.get('deny_domains', ())):
+            return True
+        return resource_type in rule.get('block_types', ())
+
+    async def attach(self, context, provider):
+        """Instala o filtro em um contexto do navegador"""
+        if not self.enabled or provider not in self.rules:
+            return
+
+        async def handle_route(route):
+            request = route.request
+            blocked = self.should_block(provider, request.url, request.resource_type)
+            with self._lock:
+                stats = self._stats(provider)
+                stats['requests'] += 1
+                if blocked:
+                    stats['blocked_requests'] += 1
+                    by_type = stats['blocked_by_type']
+                    by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+            try:
+                if blocked:
+                    await route.abort()
+                else:
+                    await route.continue_()
+            except Exception as e:
+                # A página pode ter sido fechada no meio da requisição
+                logging.debug(f"Erro ao tratar requisição interceptada: {e}")
+
+        async def on_request_finished(request):
+            # Tamanho real no fio (corpo comprimido + cabeçalhos): o content-length
+            # falta nas respostas chunked, que são a maioria dos scripts e páginas
+            try:
+                sizes = await request.sizes()
+            except Exception as e:
+                logging.debug(f"Tamanho da requisição indisponível: {e}")
+                return
+            loaded = sizes.get('responseBodySize', 0) + sizes.get('responseHeadersSize', 0)
+            if loaded > 0:
+                with self._lock:
+                    self._stats(provider)['loaded_bytes'] += loaded
+
+        await context.route("**/*", handle_route)
+        context.on("requestfinished", on_request_finished)
+
+    def report(self):
+        with self._lock:
+            return {
+                provider: dict(stats, blocked_by_type=dict(stats['blocked_by_type']))
+                for provider, stats in self.stats.items()
+            }
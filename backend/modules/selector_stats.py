@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+
+
+class SelectorStats:
+    """
+    Estatísticas de acerto das estratégias de busca do botão de download.
+
+    Cada estratégia (um texto ou um seletor) tem, por provedor, um score com
+    decaimento exponencial: a cada acerto do provedor todos os scores são
+    multiplicados por `decay` e a estratégia vencedora ganha +1; uma falha
+    multiplica o score da estratégia por `decay`. Assim, as estratégias que
+    funcionaram recentemente são tentadas primeiro e mudanças de layout do site
+    são absorvidas em poucos downloads.
+    """
+
+    def __init__(self, stats_path=None, decay=0.9):
+        self.stats_path = stats_path
+        self.decay = decay
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return {}
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Não foi possível carregar as estatísticas de seletores: {e}")
+            return {}
+
+    def _save(self):
+        if not self.stats_path:
+            return
+        tmp_path = f"{self.stats_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.stats_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar as estatísticas de seletores: {e}")
+
+    def _entry(self, provider, strategy):
+        strategies = self._data.setdefault(provider, {})
+        return strategies.setdefault(strategy, {'score': 0.0, 'hits': 0, 'misses': 0})
+
+    def order(self, provider, strategies):
+        """Ordena as estratégias pelo score (ordem original como desempate)"""
+        with self._lock:
+            known = self._data.get(provider, {})
+            return sorted(strategies, key=lambda s: -known.get(s, {}).get('score', 0.0))
+
+    def record_hit(self, provider, strategy):
+        with self._lock:
+            for entry in self._data.get(provider, {}).values():
+                entry['score'] *= self.decay
+            entry = self._entry(provider, strategy)
+            entry['score'] += 1.0
+            entry['hits'] += 1
+            self._save()
+
+    def record_miss(self, provider, strategy):
+        with self._lock:
+            entry = self._entry(provider, strategy)
+            entry['score'] *= self.decay
+            entry['misses'] += 1
+
+    def flush(self):
+        """Grava as estatísticas em disco (inclui as falhas ainda não salvas)"""
+        with self._lock:
+            self._save()
+
+    def report(self, provider=None):
+        """Retorna hits/misses/score por estratégia (do mais para o menos efetivo)"""
+        with self._lock:
+            providers = [provider] if provider else list(self._data)
+            report = {}
+            for name in providers:
+                strategies = self._data.get(name, {})
+                report[name] = [
+                    {
+                        'strategy': strategy,
+                        'hits': entry['hits'],
+                        'misses': entry['misses'],
+                        'hit_rate': entry['hits'] / max(1, entry['hits'] + entry['misses']),
+                        'score': round(entry['score'], 4),
+                    }
+                    for strategy, entry in sorted(strategies.items(), key=lambda item: -item[1]['score'])
+                ]
+            return report
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+import os
+
+
+class SessionStore:
+    """
+    Armazena o estado autenticado (cookies + localStorage) de cada provedor.
+
+    O arquivo salvo é o `storage_state` do Playwright e pode ser passado
+    diretamente para `browser.new_context(storage_state=...)`, evitando refazer
+    o login a cada download.
+    """
+
+    def __init__(self, session_path):
+        self.session_path = session_path
+        self._login_locks = {}
+        if self.session_path and not os.path.exists(self.session_path):
+            os.makedirs(self.session_path)
+
+    @property
+    def enabled(self):
+        return bool(self.session_path)
+
+    def state_path(self, provider):
+        return os.path.join(self.session_path, f"{provider}_state.json")
+
+    def get(self, provider):
+        """Retorna o caminho do estado salvo do provedor, ou None se não existir"""
+        if not self.enabled:
+            return None
+        path = self.state_path(provider)
+        return path if os.path.exists(path) else None
+
+    def login_lock(self, provider):
+        """Lock por provedor para que apenas um job faça login de cada vez"""
+        lock = self._login_locks.get(provider)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._login_locks[provider] = lock
+        return lock
+
+    def saved_after(self, provider, timestamp):
+        """Indica se a sessão do provedor foi salva depois de `timestamp`"""
+        path = self.get(provider)
+        return bool(path) and os.path.getmtime(path) > timestamp
+
+    async def apply(self, provider, context):
+        """Copia os cookies da sessão salva para um contexto já aberto"""
+        path = self.get(provider)
+        if not path:
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            await context.add_cookies(state.get('cookies', []))
+            return True
+        except Exception as e:
+            logging.warning(f"Não foi possível aplicar a sessão do {provider}: {e}")
+            return False
+
+    async def save(self, provider, context):
+        """Salva o estado atual do contexto (escrita atômica)"""
+        if not self.enabled:
+            return
+        path = self.state_path(provider)
+        tmp_path = f"{path}.tmp"
+        try:
+            await context.storage_state(path=tmp_path)
+            os.replace(tmp_path, path)
+            logging.info(f"Sessão do {provider} salva em: {path}")
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar a sessão do {provider}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def invalidate(self, provider):
+        """Descarta a sessão salva (expirada ou inválida)"""
+        if not self.enabled:
+            return
+        path = self.state_path(provider)
+        if os.path.exists(path):
+            os.remove(path)
+            logging.info(f"Sessão do {provider} expirada, será feito novo login")
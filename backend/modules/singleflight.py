@@ -0,0 +1,56 @@
+import asyncio
+import logging
+
+
+class _Flight:
+    def __init__(self):
+        self.waiters = 0
+        self.task = None
+
+
+class SingleFlight:
+    """
+    Junta requisições simultâneas para a mesma chave em uma única execução.
+
+    O primeiro chamador executa `fn`; quem pedir a mesma chave enquanto ela ainda
+    está em andamento apenas aguarda o mesmo resultado. Se `share` for informado,
+    ele recebe o resultado e a quantidade de chamadores e devolve um resultado
+    por chamador (por exemplo, uma cópia do arquivo para cada um).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.stats = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    async def do(self, key, fn, share=None):
+        self.stats['calls'] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._run(key, flight, fn, share))
+            self.stats['executions'] += 1
+        else:
+            self.stats['coalesced'] += 1
+            logging.info(f"Requisição idêntica já em andamento, aguardando o mesmo resultado: {key}")
+
+        index = flight.waiters
+        flight.waiters += 1
+        # shield: o cancelamento de um chamador não cancela o trabalho dos outros
+        results = await asyncio.shield(flight.task)
+        return results[index]
+
+    async def _run(self, key, flight, fn, share):
+        try:
+            result = await fn()
+        finally:
+            # A partir daqui novos chamadores iniciam uma nova execução,
+            # então a quantidade de chamadores deste voo é definitiva
+            self._flights.pop(key, None)
+        if share and flight.waiters > 1:
+            return share(result, flight.waiters)
+        return [result] * flight.waiters
+
+    @property
+    def in_flight(self):
+        return len(self._flights)
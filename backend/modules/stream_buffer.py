@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+
+class StreamAborted(Exception):
+    pass
+
+
+class StreamBuffer:
+    """
+    Buffer limitado entre um produtor (o download) e um consumidor (o upload),
+    para enviar os chunks enquanto o arquivo ainda está chegando.
+
+    O produtor escreve em ordem e fica bloqueado quando há `capacity` bytes
+    pendentes. O consumidor lê por posição absoluta e só descarta os bytes
+    anteriores ao que pediu, então um chunk que falhou pode ser reenviado.
+    """
+
+    def __init__(self, total, capacity):
+        self.total = total
+        self.capacity = capacity
+        self._data = bytearray()
+        self._base = 0  # posição absoluta de _data[0]
+        self._cond = threading.Condition()
+        self._finished = False
+        self._error = None
+        # MD5 do conteúdo, informado pelo produtor ao terminar
+        self.md5 = None
+
+    @property
+    def _end(self):
+        return self._base + len(self._data)
+
+    def write(self, data, block=True):
+        """
+        Acrescenta `data` ao buffer. Com `block=False` retorna False em vez de
+        esperar quando o buffer está cheio.
+        """
+        with self._cond:
+            while len(self._data) >= self.capacity and self._error is None:
+                if not block:
+                    return False
+                self._cond.wait()
+            if self._error is not None:
+                raise StreamAborted(f"Envio interrompido: {self._error}")
+            self._data += data
+            self._cond.notify_all()
+        return True
+
+    def finish(self, md5=None):
+        with self._cond:
+            self.md5 = md5
+            self._finished = True
+            self._cond.notify_all()
+
+    def fail(self, error):
+        """Interrompe os dois lados (erro no download ou no upload)"""
+        with self._cond:
+            if self._error is None:
+                self._error = error
+            self._cond.notify_all()
+
+    def read_at(self, begin, length):
+        """
+        Retorna até `length` bytes a partir de `begin`, esperando o download
+        chegar lá. Tudo antes de `begin` já foi confirmado e é descartado.
+        """
+        with self._cond:
+            if begin < self._base:
+                raise StreamAborted(f"Os bytes a partir de {begin} já foram descartados do buffer")
+            if begin > self._base:
+                del self._data[:min(begin - self._base, len(self._data))]
+                self._base = begin
+                self._cond.notify_all()
+
+            wanted = min(begin + length, self.total)
+            while self._end < wanted and self._error is None:
+                if self._finished:
+                    raise StreamAborted(f"Download terminou com {self._end} de {self.total} bytes")
+                self._cond.wait()
+            if self._error is not None:
+                raise StreamAborted(f"Download interrompido: {self._error}")
+            return bytes(self._data[:wanted - begin])
+
+    async def write_async(self, data):
+        """Versão para o event loop: só ocupa uma thread quando o buffer está cheio"""
+        if not self.write(data, block=False):
+            await asyncio.get_running_loop().run_in_executor(None, self.write, data)
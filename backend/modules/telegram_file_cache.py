@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+class TelegramFileCache:
+    """
+    Cache persistente asset -> file_id do Telegram.
+
+    Depois que um arquivo é enviado uma vez, o Telegram o guarda e devolve um
+    file_id que pode ser reenviado a qualquer chat sem novo upload. Pedidos
+    repetidos do mesmo asset são respondidos só com o file_id, sem navegador,
+    disco nem banda de upload. Um file_id recusado pelo Telegram é descartado.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Não foi possível carregar o cache de arquivos do Telegram: {e}")
+            return {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar o cache de arquivos do Telegram: {e}")
+
+    def get(self, asset_key):
+        """file_id já enviado para o asset, ou None"""
+        with self._lock:
+            entry = self._entries.get(asset_key)
+            if entry:
+                self.stats['hits'] += 1
+                return entry['file_id']
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, asset_key, file_id, file_name=None):
+        with self._lock:
+            self._entries[asset_key] = {'file_id': file_id, 'file_name': file_name, 'saved_at': time.time()}
+            self._save()
+
+    def invalidate(self, asset_key):
+        with self._lock:
+            if self._entries.pop(asset_key, None) is not None:
+                self.stats['invalidated'] += 1
+                self._save()
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import httpx
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class TransferError(Exception):
+    pass
+
+
+class TransferEngine:
+    """
+    Transfere o arquivo direto do servidor para o disco, sem passar pelo navegador.
+
+    O navegador só é usado para descobrir a URL real do arquivo; os bytes são
+    baixados por um cliente HTTP assíncrono com pool de conexões, usando os
+    cookies do contexto. Suporta retomada via Range após falhas e, para arquivos
+    grandes, download em vários segmentos paralelos.
+    """
+
+    def __init__(self, chunk_size=1024 * 1024, segments=4, segment_min_size=32 * 1024 * 1024,
+                 max_retries=3, timeout=60):
+        self.chunk_size = chunk_size
+        self.segments = max(1, segments)
+        self.segment_min_size = segment_min_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client = None
+        self.stats = {'transfers': 0, 'failures': 0, 'bytes': 0, 'seconds': 0.0}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.timeout, connect=15),
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16)
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def build_headers(cookies=None, headers=None):
+        """Monta os cabeçalhos da requisição com os cookies do contexto do navegador"""
+        result = dict(headers or {})
+        if cookies:
+            result['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in cookies)
+        return result
+
+    async def probe(self, url, cookies=None, headers=None):
+        """
+        Sonda com Range 0-0: confirma que o servidor entrega o arquivo com estes
+        cookies antes de dispensar o navegador. Retorna (tamanho, aceita_range);
+        o tamanho pode ser None se o servidor ignorar o Range e não informá-lo.
+        """
+        headers = self.build_headers(cookies, headers)
+        async with self._get_client().stream('GET', url, headers={**headers, 'Range': 'bytes=0-0'}) as response:
+            if response.status_code == 200:
+                # Servidor ignorou o Range: a resposta é fechada sem ler o corpo
+                length = response.headers.get('content-length', '')
+                return (int(length) if length.isdigit() else None), False
+            if response.status_code == 206:
+                total = self._parse_total(response)
+                if total is None:
+                    raise TransferError(f"Content-Range inválido ao acessar {url}")
+                return total, True
+            raise TransferError(f"HTTP {response.status_code} ao acessar {url}")
+
+    async def fetch(self, url, dest_path, cookies=None, headers=None, open_stream=None, probe=None):
+        """
+        Baixa `url` para `dest_path`.
+
+        `probe` é o resultado de `probe()`, se já feito; senão a sonda é feita aqui.
+        `open_stream(nome, tamanho)` (corrotina opcional) pode devolver um
+        StreamBuffer: nesse caso os bytes vão para ele, em ordem, em vez de
+        para o disco, e `dest_path` não é criado.
+        Retorna um dict com bytes, segundos, throughput (bytes/s), o MD5 do
+        conteúdo, calculado durante a gravação, e se foi transmitido (`streamed`).
+        """
+        started = time.monotonic()
+        if probe is None:
+            probe = await self.probe(url, cookies, headers)
+        total, ranges = probe
+        headers = self.build_headers(cookies, headers)
+        part_path = f"{dest_path}.part"
+        hasher = hashlib.md5()
+        stream = None
+
+        try:
+            if ranges and total and open_stream:
+                stream = await open_stream(os.path.basename(dest_path), total)
+
+            if stream is not None:
+                try:
+                    await self._fetch_resumable(url, headers, None, 0, total - 1, hasher, stream)
+                except Exception as e:
+                    stream.fail(e)
+                    raise
+                stream.finish(hasher.hexdigest())
+            elif not ranges:
+                # Sem suporte a Range: um único GET, sem retomada
+                async with self._get_client().stream('GET', url, headers=headers) as response:
+                    if response.status_code != 200:
+                        raise TransferError(f"HTTP {response.status_code} ao acessar {url}")
+                    written = await self._write_stream(response, part_path, 0, hasher)
+                if total is None:
+                    total = written
+            elif total == 0:
+                open(part_path, 'wb').close()
+            elif total >= self.segment_min_size and self.segments > 1:
+                await self._fetch_segmented(url, headers, part_path, total, hasher)
+            else:
+                await self._fetch_resumable(url, headers, part_path, 0, total - 1, hasher)
+
+            if stream is None:
+                if os.path.getsize(part_path) != total:
+                    raise TransferError(f"Tamanho incorreto: {os.path.getsize(part_path)} de {total} bytes")
+                os.replace(part_path, dest_path)
+        except Exception:
+            self.stats['failures'] += 1
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        seconds = max(time.monotonic() - started, 1e-6)
+        size = total if stream is not None else os.path.getsize(dest_path)
+        self.stats['transfers'] += 1
+        self.stats['bytes'] += size
+        self.stats['seconds'] += seconds
+        return {
+            'bytes': size,
+            'seconds': seconds,
+            'throughput': size / seconds,
+            'md5': hasher.hexdigest(),
+            'streamed': stream is not None,
+        }
+
+    @staticmethod
+    def _parse_total(response):
+        """Tamanho total do arquivo a partir do Content-Range de uma resposta 206"""
+        match = CONTENT_RANGE_RE.match(response.headers.get('content-range', ''))
+        if match and match.group(3) != '*':
+            return int(match.group(3))
+        return None
+
+    async def _write_stream(self, response, path, offset, hasher=None):
+        """Grava o corpo da resposta em `path` a partir de `offset`"""
+        mode = 'r+b' if os.path.exists(path) else 'wb'
+        written = 0
+        with open(path, mode) as f:
+            f.seek(offset)
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                f.write(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                written += len(chunk)
+        return written
+
+    async def _fetch_resumable(self, url, headers, path, start, end, hasher=None, stream=None):
+        """
+        Baixa o intervalo [start, end], retomando de onde parou em caso de erro.
+        A retomada continua em ordem, então `hasher` e `stream` (se informado, no
+        lugar de `path`) recebem os bytes na sequência.
+        """
+        position = start
+        attempt = 0
+        while position <= end:
+            previous = position
+            try:
+                range_headers = {**headers, 'Range': f'bytes={position}-{end}'}
+                async with self._get_client().stream('GET', url, headers=range_headers) as response:
+                    if response.status_code != 206:
+                        raise TransferError(f"HTTP {response.status_code} no intervalo {position}-{end}")
+                    if stream is not None:
+                        async for chunk in response.aiter_bytes(self.chunk_size):
+                            await stream.write_async(chunk)
+                            if hasher:
+                                hasher.update(chunk)
+                            position += len(chunk)
+                    else:
+                        mode = 'r+b' if os.path.exists(path) else 'wb'
+                        with open(path, mode) as f:
+                            f.seek(position)
+                            async for chunk in response.aiter_bytes(self.chunk_size):
+                                f.write(chunk)
+                                if hasher:
+                                    hasher.update(chunk)
+                                position += len(chunk)
+                if position <= end:
+                    raise TransferError(f"Conexão encerrada em {position} de {end + 1} bytes")
+            except (httpx.TransportError, TransferError) as e:
+                # Só conta como tentativa se não houve progresso desde a última
+                if position > previous:
+                    attempt = 0
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logging.warning(f"Falha na transferência em {position} bytes ({e}), retomando (tentativa {attempt})")
+                await asyncio.sleep(min(2 ** attempt, 10))
+
+    async def _fetch_segmented(self, url, headers, path, total, hasher=None):
+        """
+        Baixa o arquivo em segmentos paralelos gravados direto nas posições finais.
+
+        O MD5 (`hasher`) é calculado em ordem: o primeiro segmento enquanto chega e
+        cada um dos seguintes assim que todos os anteriores terminam, relido do
+        cache de páginas enquanto os demais ainda estão baixando.
+        """
+        # Pré-aloca o arquivo para que cada segmento escreva na sua posição
+        with open(path, 'wb') as f:
+            f.truncate(total)
+
+        segment_size = -(-total // self.segments)
+        ranges = [
+            (start, min(start + segment_size, total) - 1)
+            for start in range(0, total, segment_size)
+        ]
+        logging.info(f"Transferindo {total / 1024 / 1024:.2f}MB em {len(ranges)} segmentos paralelos")
+        tasks = [
+            asyncio.ensure_future(self._fetch_resumable(url, headers, path, start, end, hasher if i == 0 else None))
+            for i, (start, end) in enumerate(ranges)
+        ]
+        loop = asyncio.get_running_loop()
+        try:
+            for i, (task, (start, end)) in enumerate(zip(tasks, ranges)):
+                await task
+                if hasher and i > 0:
+                    await loop.run_in_executor(None, self._hash_range, path, start, end, hasher)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _hash_range(self, path, start, end, hasher):
+        """Acrescenta ao hash os bytes [start, end] já gravados em `path`"""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    raise TransferError(f"Arquivo parcial menor que o esperado em {path}")
+                hasher.update(chunk)
+                remaining -= len(chunk)
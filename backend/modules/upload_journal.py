@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Sessões de upload resumable do Drive expiram em cerca de uma semana
+SESSION_MAX_AGE = 6 * 24 * 3600
+
+
+class UploadJournal:
+    """
+    Diário em disco das sessões de upload resumable do Drive.
+
+    Guarda, por conteúdo (tamanho e MD5 do arquivo), a URI da sessão, o nome do
+    arquivo no Drive e o último byte confirmado pelo servidor, para que um
+    upload interrompido (queda de rede, reinício do processo) continue de onde
+    parou em vez de recomeçar do zero. O nome local não entra na chave: após um
+    reinício, o arquivo baixado de novo pode ganhar outro caminho.
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return {}
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logging.warning(f"Não foi possível carregar o diário de uploads: {e}")
+            return {}
+        now = time.time()
+        return {
+            key: entry for key, entry in entries.items()
+            if now - entry.get('created', 0) < SESSION_MAX_AGE
+        }
+
+    def _save(self):
+        if not self.journal_path:
+            return
+        tmp_path = f"{self.journal_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.journal_path)
+        except Exception as e:
+            logging.warning(f"Não foi possível salvar o diário de uploads: {e}")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def start(self, key, uri, size, name=None):
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {
+                'uri': uri, 'offset': 0, 'size': size, 'name': name, 'created': now, 'updated': now
+            }
+            self._save()
+
+    def update(self, key, offset):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry['offset'] = offset
+                entry['updated'] = time.time()
+                self._save()
+
+    def finish(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Benchmark: upload resumable do Drive contra um servidor local que imita a API
+
+Sobe um servidor HTTP local com o protocolo de upload resumable do Drive
+(sessão com Location, chunks com Content-Range, 308 + Range, consulta de
+status com "bytes */tamanho") e mede a vazão do DriveService em cada cenário:
+
+- completo: upload sem falhas
+- retomada: o processo "morre" no meio do upload e um novo DriveService
+  continua do último byte confirmado, pelo diário em disco
+- sessão expirada: a sessão retomada devolve 404 e o upload recomeça do zero
+- falha de rede / HTTP 503: conexões derrubadas e erros 503 seguidos no meio
+  do envio, retomados sem recomeçar
+- MD5 divergente: o diário aponta para a sessão de outro conteúdo do mesmo
+  tamanho; o arquivo corrompido é apagado e o envio é refeito
+
+Cada cenário confere o MD5 do arquivo final no servidor. Não acessa o Google.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_drive_upload.py [--size-mb 8]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import httplib2
+from googleapiclient.discovery import build
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.modules.drive_service import DriveService  # noqa: E402
+
+CHUNK_SIZE = 256 * 1024
+FOLDER_ID = 'pasta-local'
+
+
+class FakeDrive:
+    """Estado do servidor: sessões de upload, arquivos criados e falhas a injetar"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.files = {}
+        self.received = 0  # bytes recebidos em chunks (mede o que foi reenviado)
+        self.drop = 0  # próximos PUTs de chunk respondidos derrubando a conexão
+        self.fail_status = []  # próximos PUTs de chunk respondidos com estes status
+        self.die_after = None  # a partir deste byte, todo PUT de chunk derruba a conexão
+
+    def reset_faults(self):
+        with self.lock:
+            self.drop = 0
+            self.fail_status = []
+            self.die_after = None
+            self.received = 0
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # O httplib2 repete sozinho um PUT cuja conexão caiu, mas sem o corpo (o stream
+    # do arquivo já foi lido): como o Drive, desiste de esperar pelos bytes
+    timeout = 2
+    drive = None  # FakeDrive, definido em run()
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        # Fecha o socket sem responder, como uma queda de rede no meio do chunk
+        self.close_connection = True
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        match = re.search(r'/files/([^/]+)$', path)
+        if match and match.group(1) == FOLDER_ID:
+            self._send(200, {'id': FOLDER_ID, 'name': 'Pasta local', 'permissions': []})
+        elif match and match.group(1) in self.drive.files:
+            self._send(200, self.drive.files[match.group(1)])
+        elif path.endswith('/files'):
+            self._send(200, {'files': list(self.drive.files.values())})
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found'}})
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        body = self._body()
+        if 'resumable' in parse_qs(parts.query).get('uploadType', []):
+            upload_id = uuid.uuid4().hex
+            with self.drive.lock:
+                self.drive.sessions[upload_id] = {
+                    'metadata': json.loads(body or b'{}'),
+                    'total': int(self.headers['X-Upload-Content-Length']),
+                    'data': bytearray(),
+                }
+            location = f"http://{self.headers['Host']}/upload/session/{upload_id}"
+            self._send(200, None, {'Location': location})
+        elif parts.path.endswith('/permissions'):
+            self._send(200, {'type': 'anyone', 'role': 'reader'})
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found'}})
+
+    def do_DELETE(self):
+        file_id = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        with self.drive.lock:
+            found = self.drive.files.pop(file_id, None)
+        self._send(204 if found else 404)
+
+    def do_PUT(self):
+        upload_id = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        body = self._body()
+        drive = self.drive
+        with drive.lock:
+            session = drive.sessions.get(upload_id)
+            if session is None:
+                return self._send(404, {'error': {'code': 404, 'message': 'upload session not found'}})
+
+            content_range = self.headers.get('Content-Range', '')
+            query = re.match(r'bytes \*/(\d+)', content_range)
+            if not query:
+                if drive.drop or (drive.die_after is not None and len(session['data']) >= drive.die_after):
+                    drive.drop = max(0, drive.drop - 1)
+                    return self._drop()
+                if drive.fail_status:
+                    status = drive.fail_status.pop(0)
+                    return self._send(status, {'error': {'code': status, 'message': 'injected'}})
+                match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range)
+                start = int(match.group(1))
+                if start > len(session['data']):
+                    return self._send(400, {'error': {'code': 400, 'message': 'gap in upload'}})
+                del session['data'][start:]
+                session['data'] += body
+                drive.received += len(body)
+
+            data = session['data']
+            if len(data) < session['total']:
+                headers = {'Range': f"bytes=0-{len(data) - 1}"} if data else {}
+                return self._send(308, None, headers)
+
+            file_id = session.get('file_id')
+            if file_id is None:
+                file_id = session['file_id'] = uuid.uuid4().hex[:16]
+                drive.files[file_id] = {
+                    'id': file_id,
+                    'name': session['metadata'].get('name'),
+                    'md5Checksum': hashlib.md5(bytes(data)).hexdigest(),
+                    'webViewLink': f"https://drive.local/file/d/{file_id}/view",
+                }
+            self._send(200, drive.files[file_id])
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Conexões derrubadas de propósito não são erro do benchmark
+        pass
+
+
+class LocalHttp(httplib2.Http):
+    """Transporte do googleapiclient que manda toda requisição para o servidor local"""
+
+    def __init__(self, base_url):
+        super().__init__(timeout=30)
+        self.base_url = base_url
+        # Como no googleapiclient.http.build_http: 308 é "Resume Incomplete", não redirecionamento
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        uri = re.sub(r'^https?://[^/]+', self.base_url, uri)
+        return super().request(uri, method, body, headers, *args, **kwargs)
+
+
+def new_service(base_url, journal_path, max_upload_retries=3):
+    """DriveService apontado para o servidor local (equivale a um novo processo)"""
+    drive = DriveService(
+        credentials_path='',
+        folder_id=FOLDER_ID,
+        chunk_size=CHUNK_SIZE,
+        journal_path=journal_path,
+        api_endpoint=f"{base_url}/",
+        max_upload_retries=max_upload_retries,
+        dedupe=False,
+    )
+    drive.service = build(
+        'drive', 'v3', http=LocalHttp(base_url), client_options=drive.client_options,
+        cache_discovery=False, static_discovery=True
+    )
+    return drive
+
+
+def uploaded_md5(fake, link):
+    file_id = link.split('/d/')[1].split('/')[0]
+    return fake.files[file_id]['md5Checksum']
+
+
+def run(size_mb):
+    fake = FakeDrive()
+    FakeDriveHandler.drive = fake
+    server = QuietServer(('127.0.0.1', 0), FakeDriveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    size = size_mb * 1024 * 1024
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_path = os.path.join(tmp, 'journal.json')
+
+        def make_file(name):
+            path = os.path.join(tmp, name)
+            content = os.urandom(size)
+            with open(path, 'wb') as f:
+                f.write(content)
+            return path, hashlib.md5(content).hexdigest()
+
+        def check(name, link, md5, started, max_received=None):
+            seconds = time.perf_counter() - started
+            ok = bool(link) and uploaded_md5(fake, link) == md5
+            if ok and max_received is not None:
+                ok = fake.received <= max_received
+            results.append(ok)
+            print(
+                f"{name:>18}: {'ok' if ok else 'FALHOU'} | {seconds:.2f}s | "
+                f"{fake.received / 1024 / 1024:.2f}MB enviados ({size / seconds / 1024 / 1024:.2f}MB/s)"
+            )
+
+        def interrupt(path, md5, at):
+            """Upload que morre em `at` bytes, deixando a sessão no diário"""
+            fake.reset_faults()
+            fake.die_after = at
+            assert new_service(base_url, journal_path, max_upload_retries=0).upload_file(path, md5) is None
+            fake.reset_faults()
+
+        # Upload completo, sem falhas
+        path, md5 = make_file('completo.bin')
+        fake.reset_faults()
+        started = time.perf_counter()
+        check('completo', new_service(base_url, journal_path).upload_file(path, md5), md5, started)
+
+        # Reinício no meio: o novo processo envia só o que faltava
+        path, md5 = make_file('retomada.bin')
+        interrupt(path, md5, size // 2)
+        started = time.perf_counter()
+        link = new_service(base_url, journal_path).upload_file(path, md5)
+        check('retomada', link, md5, started, max_received=size - size // 2)
+
+        # Sessão expirada no servidor (404): recomeça do zero
+        path, md5 = make_file('expirada.bin')
+        interrupt(path, md5, size // 2)
+        fake.sessions.clear()
+        started = time.perf_counter()
+        check('sessão expirada', new_service(base_url, journal_path).upload_file(path, md5), md5, started)
+
+        # Conexões derrubadas no meio do envio: retoma do último byte confirmado
+        path, md5 = make_file('rede.bin')
+        fake.reset_faults()
+        fake.drop = 2
+        started = time.perf_counter()
+        check('falha de rede', new_service(base_url, journal_path).upload_file(path, md5), md5, started,
+              max_received=size + 2 * CHUNK_SIZE)
+
+        # 503 seguidos no meio do envio
+        path, md5 = make_file('http503.bin')
+        fake.reset_faults()
+        fake.fail_status = [503] * 3
+        started = time.perf_counter()
+        check('HTTP 503', new_service(base_url, journal_path).upload_file(path, md5), md5, started)
+
+        # Diário apontando para a sessão de outro conteúdo do mesmo tamanho
+        other_path, other_md5 = make_file('outro.bin')
+        interrupt(other_path, other_md5, size // 2)
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+        path, md5 = make_file('divergente.bin')
+        journal[f"{size}:{md5}"] = journal.pop(f"{size}:{other_md5}")
+        with open(journal_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+        files_before = len(fake.files)
+        started = time.perf_counter()
+        check('MD5 divergente', new_service(base_url, journal_path).upload_file(path, md5), md5, started)
+        results.append(len(fake.files) == files_before + 1)
+        if not results[-1]:
+            print("    arquivo corrompido não foi apagado do servidor")
+
+    server.shutdown()
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=8, help='tamanho de cada arquivo enviado')
+    parser.add_argument('--verbose', action='store_true', help='mostra os logs do DriveService')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    sys.exit(0 if run(args.size_mb) else 1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tempo de inicialização da GUI
+
+Executa run_gui.py várias vezes com GUI_STARTUP_PROFILE=1 (a GUI imprime as
+medições em JSON e fecha sozinha quando o backend termina de inicializar) e
+resume, em ms desde o início do import do frontend:
+
+- import_ms: import do frontend/app.py (sem o backend)
+- first_paint_ms: janela desenhada pela primeira vez
+- backend_ready_ms: backend (playwright, Google Drive...) pronto para uso
+
+Precisa de um display (em servidores: xvfb-run python benchmarks/bench_gui_startup.py).
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_gui_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ('import_ms', 'first_paint_ms', 'backend_ready_ms')
+
+
+def run_once(timeout):
+    env = dict(os.environ, GUI_STARTUP_PROFILE='1')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'run_gui.py')],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    total_ms = round((time.perf_counter() - start) * 1000)
+    for line in proc.stdout.splitlines():
+        if line.startswith('{'):
+            result = json.loads(line)
+            result['process_ms'] = total_ms
+            return result
+    raise RuntimeError(f"GUI não imprimiu as medições (código {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def main(runs, timeout):
+    results = [run_once(timeout) for _ in range(runs)]
+    for metric in METRICS + ('process_ms',):
+        values = [r[metric] for r in results if metric in r]
+        if not values:
+            continue
+        print(
+            f"{metric:>17}: mediana {statistics.median(values):.0f}ms | "
+            f"mín {min(values)}ms | máx {max(values)}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='execuções da GUI')
+    parser.add_argument('--timeout', type=int, default=120, help='tempo máximo por execução (s)')
+    args = parser.parse_args()
+    main(args.runs, args.timeout)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vazão da fila persistente de jobs (SQLite em modo WAL)
+
+Mede, em um arquivo temporário:
+
+- enqueue: um job por transação (como o bot e a GUI enfileiram links avulsos)
+- enqueue_many: lotes de jobs por transação (colar vários links na GUI)
+- claim + complete: ciclo completo de um worker, com a fila cheia
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_job_store.py [--jobs 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.modules.job_store import JobStore  # noqa: E402
+
+URL = "https://www.freepik.com/free-vector/flat-design-item_23-{}.htm"
+
+
+def report(name, count, seconds):
+    print(f"{name:>18}: {count} ops em {seconds:.2f}s ({count / seconds:,.0f} ops/s)")
+
+
+def main(jobs, batch):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, 'jobs.db'))
+
+        start = time.perf_counter()
+        for i in range(jobs):
+            store.enqueue('bench', URL.format(i), payload={'chat_id': 1, 'message_id': i})
+        report('enqueue', jobs, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, jobs, batch):
+            store.enqueue_many('bench', [URL.format(i) for i in range(offset, min(offset + batch, jobs))])
+        report(f'enqueue_many({batch})', jobs, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        claimed = 0
+        while True:
+            job = store.claim('bench', 'bench-worker')
+            if job is None:
+                break
+            store.complete(job['id'], 'ok')
+            claimed += 1
+        report('claim + complete', claimed, time.perf_counter() - start)
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--jobs', type=int, default=5000, help='jobs por variante')
+    parser.add_argument('--batch', type=int, default=100, help='jobs por transação no enqueue_many')
+    args = parser.parse_args()
+    main(args.jobs, args.batch)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: extração de links em lote (mensagens do bot / campo de links da GUI)
+
+Compara, sobre o mesmo conjunto de mensagens sintéticas com variantes das URLs
+(subdomínio de idioma, parâmetros de rastreamento, fragmento, pontuação colada):
+
+- "antes": regex montada a cada mensagem + verificação por substring
+- "depois": backend.modules.asset_url.find_asset_links (regex compilada uma vez,
+  URL canônica e deduplicação por asset)
+
+Também mostra quantas chaves de asset distintas cada abordagem produz: o
+número ideal é a quantidade real de assets.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_link_parsing.py [--messages 20000]
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.modules.asset_url import canonical_asset_key, find_asset_links  # noqa: E402
+
+ASSETS = 500
+
+
+def legacy_find_links(text):
+    # Como o handler do bot fazia: padrões montados a cada mensagem
+    freepik_pattern = r'https?://(?:www\.)?freepik\.com/[^\s]+'
+    envato_pattern = r'https?://(?:www\.)?elements\.envato\.com/[^\s]+'
+    return re.findall(f'({freepik_pattern}|{envato_pattern})', text)
+
+
+def url_variants(rng, index):
+    """Uma URL de um dos ASSETS assets, em uma variante aleatória"""
+    if index % 2 == 0:
+        host = rng.choice(['www.freepik.com', 'br.freepik.com', 'freepik.com'])
+        url = f"https://{host}/free-vector/flat-design-item_23-{2149000000 + index}.htm"
+    else:
+        locale = rng.choice(['', '/pt-br', '/es'])
+        url = f"https://elements.envato.com{locale}/business-template-{index:07X}"
+    url += rng.choice(['', '?utm_source=telegram', '#query=design&position=3'])
+    return url + rng.choice(['', '', '.', ','])
+
+
+def build_messages(count, seed=42):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        links = [url_variants(rng, rng.randrange(ASSETS)) for _ in range(rng.randint(1, 4))]
+        messages.append("Baixa esses pra mim: " + " \n".join(links) + " valeu!")
+    return messages
+
+
+def measure(fn, messages, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(message_count, rounds):
+    messages = build_messages(message_count)
+
+    results = {
+        'antes': measure(legacy_find_links, messages, rounds),
+        'depois': measure(find_asset_links, messages, rounds),
+    }
+    for name, values in results.items():
+        per_message = statistics.median(values) / len(messages) * 1e6
+        print(
+            f"{name:>6}: mediana {statistics.median(values) * 1000:.1f}ms para {len(messages)} mensagens "
+            f"({per_message:.2f}µs/mensagem)"
+        )
+
+    legacy_keys = {link for message in messages for link in legacy_find_links(message)}
+    new_keys = {canonical_asset_key(link) for message in messages for link in find_asset_links(message)}
+    print(f"chaves distintas: antes {len(legacy_keys)} | depois {len(new_keys)} (assets reais: até {ASSETS})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=20000, help='mensagens por rodada')
+    parser.add_argument('--rounds', type=int, default=5, help='rodadas por variante')
+    args = parser.parse_args()
+    main(args.messages, args.rounds)
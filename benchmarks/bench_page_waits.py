@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: esperas fixas x esperas por evento no fluxo de download do Freepik
+
+Sobe uma página local que imita o Freepik (banner de cookies, botão de download
+renderizado por JavaScript e um script de analytics fazendo polling) e mede a
+latência por job de:
+
+- "antes": a sequência antiga (wait_for_timeout fixos + networkidle)
+- "depois": o fluxo atual do Downloader (esperas por elemento/URL)
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_page_waits.py [--jobs 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.modules.browser_pool import BrowserPool  # noqa: E402
+from backend.modules.downloader import Downloader  # noqa: E402
+
+ITEM_PAGE = b"""<!doctype html>
+<html><head><title>stand-in</title></head>
+<body>
+<header><nav>Logo</nav></header>
+<main id="main"></main>
+<script>
+  // Banner de cookies e botao de download renderizados depois do carregamento
+  setTimeout(function () {
+    var b = document.createElement('button');
+    b.id = 'onetrust-accept-btn-handler';
+    b.textContent = 'Accept';
+    b.onclick = function () { b.remove(); };
+    document.body.appendChild(b);
+  }, 150);
+  setTimeout(function () {
+    var a = document.createElement('a');
+    a.href = '/file.zip';
+    a.textContent = 'Download';
+    document.getElementById('main').appendChild(a);
+  }, 400);
+  // Analytics fazendo polling (atrapalha o "networkidle")
+  setInterval(function () { fetch('/analytics'); }, 800);
+</script>
+</body></html>"""
+
+FILE_BODY = os.urandom(256 * 1024)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/item/'):
+            self._send(200, 'text/html', ITEM_PAGE)
+        elif self.path == '/file.zip':
+            self._send(200, 'application/zip', FILE_BODY, {
+                'Content-Disposition': 'attachment; filename="asset.zip"'
+            })
+        elif self.path == '/analytics':
+            time.sleep(0.1)
+            self._send(204, 'text/plain', b'')
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+async def legacy_flow(page, url, download_path):
+    """Reprodução da sequência antiga de esperas do _download_freepik"""
+    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+    try:
+        await page.click("#onetrust-accept-btn-handler", timeout=5000)
+        await page.wait_for_timeout(1000)
+    except Exception:
+        pass
+    await page.wait_for_load_state("networkidle", timeout=20000)
+    await page.wait_for_timeout(2000)
+    elem = page.locator('button:has-text("Download"), a:has-text("Download")').first
+    async with page.expect_download(timeout=60000) as download_info:
+        await elem.click()
+    download = await download_info.value
+    path = os.path.join(download_path, download.suggested_filename)
+    await download.save_as(path)
+    return path
+
+
+async def run(jobs):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # O Chromium resolve www.freepik.com para o servidor local
+    url = f"http://www.freepik.com:{server.server_address[1]}/item/asset_123.htm"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        downloader = Downloader(
+            freepik_creds={'email': '', 'password': ''},
+            envato_creds={'email': '', 'password': ''},
+            download_path=tmp
+        )
+        downloader.browser_pool = BrowserPool(launch_args=['--host-resolver-rules=MAP www.freepik.com 127.0.0.1'])
+        try:
+            # Aquece o pool para medir apenas o fluxo da página
+            await downloader.browser_pool.start()
+
+            results = {'antes': [], 'depois': []}
+            for _ in range(jobs):
+                async with downloader.browser_pool.context() as context:
+                    page = await context.new_page()
+                    start = time.perf_counter()
+                    assert await legacy_flow(page, url, tmp)
+                    results['antes'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                assert await downloader.download_file(url)
+                results['depois'].append(time.perf_counter() - start)
+        finally:
+            await downloader.close()
+            server.shutdown()
+
+    for name, values in results.items():
+        print(
+            f"{name:>6}: média {statistics.mean(values):.2f}s | "
+            f"mediana {statistics.median(values):.2f}s | "
+            f"mín {min(values):.2f}s | máx {max(values):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--jobs', type=int, default=5, help='jobs por variante')
+    args = parser.parse_args()
+    asyncio.run(run(args.jobs))
@@ -1,8 +1,18 @@
+import time
+
+# Referência para as medições de inicialização (janela exibida / backend pronto)
+STARTUP_T0 = time.perf_counter()
+
 import threading
-import queue
 import asyncio
+import logging
+import logging.handlers
 import os
+import queue
+import json
 import sys
+import uuid
+from collections import deque
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
@@ -10,23 +20,312 @@ from tkinter import ttk, scrolledtext, messagebox
 # Adiciona o diretório raiz ao path para importar o backend
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Try to import backend AutomationApp
+from backend.modules.asset_url import find_asset_links
+from backend.modules.job_store import JobStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+# O backend (playwright, Google Drive...) é importado e criado em segundo plano
+# por init_backend, depois que a janela já está na tela
+backend_app = None
+backend_available = False
+backend_error = None
+backend_ready = threading.Event()
+
+def init_backend():
+    """Importa e inicializa o backend. Chamado fora da thread da GUI."""
+    global backend_app, backend_available, backend_error
+    try:
+        from backend.main import AutomationApp
+        backend_app = AutomationApp()
+        backend_available = True
+    except Exception as e:
+        backend_error = str(e)
+    finally:
+        backend_ready.set()
+
+# Fila de jobs persistente (SQLite): links pendentes sobrevivem a quedas e reinícios
+try:
+    from backend.config import JOB_STORE_PATH, JOB_RETENTION_DAYS, GUI_MAX_IN_FLIGHT, GUI_DRAIN_TIMEOUT
+except Exception:
+    JOB_STORE_PATH = os.path.join(os.getcwd(), "data", "jobs.db")
+    JOB_RETENTION_DAYS = 7
+    GUI_MAX_IN_FLIGHT = 4
+    GUI_DRAIN_TIMEOUT = 30
 try:
-    from backend.main import AutomationApp
-    backend_app = AutomationApp()
-    backend_available = True
-    backend_error = None
-except Exception as e:
-    backend_app = None
-    backend_available = False
-    backend_error = str(e)
-
-# Fila local de jobs
-job_queue = queue.Queue()
+    from backend.config import GUI_LOG_MAX_LINES, GUI_LOG_LEVEL
+except Exception:
+    GUI_LOG_MAX_LINES = 5000
+    GUI_LOG_LEVEL = "INFO"
+JOB_QUEUE = 'gui'
+job_store = JobStore(JOB_STORE_PATH, retention_seconds=JOB_RETENTION_DAYS * 24 * 3600)
+worker_id = f"gui-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# Acorda o worker quando novos links são adicionados (ou ao parar)
+worker_wakeup = threading.Event()
 worker_running = False
 worker_thread = None
+# Janela sendo fechada: resultados que chegarem depois não atualizam mais a interface
+closing = False
+
+# Perfil de inicialização: imprime as medições em JSON e fecha a janela
+STARTUP_PROFILE = os.getenv("GUI_STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+# Event loop dedicado ao backend. Fica vivo durante toda a execução da GUI
+# para que o pool de navegadores seja reaproveitado entre os jobs.
+backend_loop = None
+backend_loop_thread = None
+backend_loop_lock = threading.Lock()
+
+def get_backend_loop():
+    """Retorna o event loop do backend, iniciando a thread se necessário"""
+    global backend_loop, backend_loop_thread
+    with backend_loop_lock:
+        if backend_loop is None:
+            backend_loop = asyncio.new_event_loop()
+            backend_loop_thread = threading.Thread(target=backend_loop.run_forever, daemon=True)
+            backend_loop_thread.start()
+        return backend_loop
+
+def run_backend(coro, timeout=None):
+    """Executa uma corrotina no event loop do backend e aguarda o resultado"""
+    return asyncio.run_coroutine_threadsafe(coro, get_backend_loop()).result(timeout)
+
+# No encerramento a GUI já esperou os jobs (wait_drain) e cancelou os restantes:
+# o backend só aguarda o cancelamento terminar, e o prazo total cobre essa espera
+# mais o fechamento dos navegadores e do Drive
+SHUTDOWN_DRAIN_TIMEOUT = 5
+SHUTDOWN_TIMEOUT = SHUTDOWN_DRAIN_TIMEOUT + 10
+
+def shutdown_backend():
+    """Encerra o backend (pool de navegadores) e o event loop dedicado"""
+    global backend_loop, backend_loop_thread
+    if backend_loop is None:
+        return
+    try:
+        if backend_app:
+            run_backend(backend_app.shutdown(drain_timeout=SHUTDOWN_DRAIN_TIMEOUT), timeout=SHUTDOWN_TIMEOUT)
+    except Exception as e:
+        print(f"Erro ao encerrar o backend: {e}")
+    backend_loop.call_soon_threadsafe(backend_loop.stop)
+    backend_loop_thread.join(timeout=5)
+    backend_loop = None
+    backend_loop_thread = None
+
+def format_size(size):
+    """Tamanho em bytes legível (ex.: 12.3 MB)"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+class JobListModel:
+    """
+    Jobs da fila indexados pelo ID do job store e exibidos em um ttk.Treeview.
+
+    As alterações só marcam a linha como pendente; o Treeview é atualizado em lote,
+    no máximo uma vez por quadro, e apenas nas linhas que mudaram. Todos os métodos
+    devem ser chamados na thread da GUI.
+    """
+
+    FRAME_MS = 100
+    # Limita o trabalho por quadro (ex.: ao colar milhares de links de uma vez)
+    MAX_ROWS_PER_FRAME = 500
+
+    STATUS_LABELS = {
+        'queued': '⏳ Na fila',
+        'running': '🔄 Processando',
+        'done': '✅ Concluído',
+        'failed': '❌ Erro',
+    }
+
+    def __init__(self, root, tree, on_flush=None):
+        self.root = root
+        self.tree = tree
+        self.on_flush = on_flush
+        self.jobs = {}
+        self.counts = dict.fromkeys(self.STATUS_LABELS, 0)
+        # Linhas que mudaram desde o último quadro (dict como conjunto ordenado)
+        self._dirty = {}
+        self._rendered = set()
+        self._flush_scheduled = False
+
+    def add(self, job_id, url, status='queued'):
+        if job_id in self.jobs:
+            return
+        self.jobs[job_id] = {'url': url, 'status': status, 'size': None, 'started': None, 'finished': None}
+        self.counts[status] += 1
+        self._mark(job_id)
+
+    def set_status(self, job_id, status, size=None):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        self.counts[job['status']] -= 1
+        self.counts[status] += 1
+        job['status'] = status
+        if status == 'running':
+            job['started'] = time.monotonic()
+        elif status in ('done', 'failed'):
+            job['finished'] = time.monotonic()
+        if size is not None:
+            job['size'] = size
+        self._mark(job_id)
+
+    def remove_where(self, statuses):
+        """Remove os jobs com um dos status indicados e retorna quantos foram removidos"""
+        removed = [job_id for job_id, job in self.jobs.items() if job['status'] in statuses]
+        for job_id in removed:
+            self.counts[self.jobs.pop(job_id)['status']] -= 1
+            self._mark(job_id)
+        return len(removed)
+
+    def refresh_running(self):
+        """Atualiza o tempo decorrido dos jobs em andamento"""
+        if self.counts['running']:
+            for job_id, job in self.jobs.items():
+                if job['status'] == 'running':
+                    self._mark(job_id)
+
+    def _mark(self, job_id):
+        self._dirty[job_id] = None
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.root.after(self.FRAME_MS, self.flush)
+
+    def _values(self, job):
+        size = format_size(job['size']) if job['size'] is not None else ''
+        if job['started'] is None:
+            elapsed = ''
+        else:
+            elapsed = format_elapsed((job['finished'] or time.monotonic()) - job['started'])
+        return (self.STATUS_LABELS[job['status']], job['url'], size, elapsed)
+
+    def flush(self):
+        self._flush_scheduled = False
+        batch = []
+        for job_id in self._dirty:
+            batch.append(job_id)
+            if len(batch) >= self.MAX_ROWS_PER_FRAME:
+                break
+
+        deleted = []
+        for job_id in batch:
+            del self._dirty[job_id]
+            iid = str(job_id)
+            job = self.jobs.get(job_id)
+            if job is None:
+                if job_id in self._rendered:
+                    self._rendered.discard(job_id)
+                    deleted.append(iid)
+            elif job_id in self._rendered:
+                self.tree.item(iid, values=self._values(job), tags=(job['status'],))
+            else:
+                self.tree.insert('', tk.END, iid=iid, values=self._values(job), tags=(job['status'],))
+                self._rendered.add(job_id)
+        if deleted:
+            self.tree.delete(*deleted)
+
+        if self._dirty:
+            self._flush_scheduled = True
+            self.root.after(self.FRAME_MS, self.flush)
+        if self.on_flush:
+            self.on_flush()
+
+class LogModel:
+    """
+    Buffer circular das linhas de log da GUI, limitado a `max_lines`.
+
+    Pode receber linhas de qualquer thread; a GUI busca as novas em lote com
+    `take()`, já filtradas pelo nível mínimo. Registros do `logging` do backend
+    chegam pela fila `records` (alimentada por um QueueHandler).
+    """
+
+    LEVELS = {'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40}
+    ICONS = {
+        "DEBUG": "🔧",
+        "INFO": "ℹ️",
+        "SUCCESS": "✅",
+        "ERROR": "❌",
+        "WARNING": "⚠️"
+    }
+
+    def __init__(self, max_lines=5000, min_level="INFO"):
+        self.max_lines = max(1, max_lines)
+        self.min_level = self.LEVELS.get(min_level, self.LEVELS['INFO'])
+        self.lines = deque(maxlen=self.max_lines)
+        # Linhas ainda não exibidas (também limitadas: o excesso sairia do buffer de qualquer forma)
+        self._pending = deque(maxlen=self.max_lines)
+        # Filtro mudou ou o log foi limpo: a próxima leitura redesenha tudo
+        self._reset = False
+        self._lock = threading.Lock()
+        self.records = queue.SimpleQueue()
+
+    def append(self, message, level="INFO", when=None):
+        timestamp = (when or datetime.now()).strftime("%H:%M:%S")
+        icon = self.ICONS.get(level, "ℹ️")
+        line = (self.LEVELS.get(level, self.LEVELS['INFO']), f"[{timestamp}] {icon} {message}")
+        with self._lock:
+            self.lines.append(line)
+            self._pending.append(line)
+
+    def set_min_level(self, level):
+        with self._lock:
+            self.min_level = self.LEVELS.get(level, self.LEVELS['INFO'])
+            self._reset = True
+
+    def clear(self):
+        with self._lock:
+            self.lines.clear()
+            self._pending.clear()
+            self._reset = True
+
+    def _drain_records(self):
+        while True:
+            try:
+                record = self.records.get_nowait()
+            except queue.Empty:
+                return
+            if record.levelno >= logging.ERROR:
+                level = "ERROR"
+            elif record.levelno >= logging.WARNING:
+                level = "WARNING"
+            elif record.levelno >= logging.INFO:
+                level = "INFO"
+            else:
+                level = "DEBUG"
+            self.append(record.getMessage(), level, datetime.fromtimestamp(record.created))
+
+    def take(self):
+        """
+        Retorna (reset, linhas): as linhas novas desde a última chamada, filtradas
+        pelo nível mínimo. Com reset=True, são todas as linhas do buffer e a
+        exibição deve ser refeita.
+        """
+        self._drain_records()
+        with self._lock:
+            reset = self._reset
+            lines = list(self.lines) if reset else list(self._pending)
+            self._pending.clear()
+            self._reset = False
+            min_level = self.min_level
+        return reset, [text for level, text in lines if level >= min_level]
+
+class _NoisyLoggerFilter(logging.Filter):
+    """Descarta o log de cada requisição HTTP (httpx/httpcore) no console da GUI"""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or not record.name.startswith(('httpx', 'httpcore'))
 
 class AutomationBotGUI:
+    LOG_FLUSH_MS = 200
+
     def __init__(self, root):
         self.root = root
         self.root.title("🤖 Automation Bot - Download Manager")
@@ -34,7 +333,23 @@ class AutomationBotGUI:
         self.root.minsize(800, 600)
         
         # Variáveis
-        self.job_list_items = []
+        self.job_list = None
+        self.startup_times = {'import_ms': IMPORT_MS}
+        self.log_model = LogModel(GUI_LOG_MAX_LINES, GUI_LOG_LEVEL)
+
+        # Logs do backend (logging) também aparecem no console da GUI
+        self.log_handler = logging.handlers.QueueHandler(self.log_model.records)
+        self.log_handler.addFilter(_NoisyLoggerFilter())
+        logging.getLogger().addHandler(self.log_handler)
+
+        # Jobs submetidos ao backend e ainda em andamento (future -> url).
+        # O worker só pega um novo job da fila quando há vaga.
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+        self.in_flight_slots = threading.BoundedSemaphore(max(1, GUI_MAX_IN_FLIGHT))
+
+        # Encerramento já iniciado (botão Sair e fechar a janela chamam on_closing)
+        self.shutting_down = False
         
         # Configurar estilo
         self.setup_style()
@@ -44,6 +359,10 @@ class AutomationBotGUI:
         
         # Inicializar logs
         self.initialize_logs()
+        self.flush_logs()
+
+        # Links que ficaram pendentes na execução anterior
+        self.restore_pending_jobs()
         
         # Atualizar status periodicamente
         self.update_status()
@@ -68,6 +387,17 @@ class AutomationBotGUI:
         
         # Configurar cores do root
         self.root.configure(bg=self.colors['bg'])
+        
+        # Tabela da fila de jobs
+        style.configure(
+            'Jobs.Treeview',
+            background=self.colors['entry_bg'],
+            fieldbackground=self.colors['entry_bg'],
+            foreground=self.colors['fg'],
+            font=('Consolas', 9),
+            rowheight=20
+        )
+        style.configure('Jobs.Treeview.Heading', font=('Arial', 9, 'bold'))
     
     def create_widgets(self):
         """Cria todos os widgets da interface"""
@@ -107,10 +437,10 @@ class AutomationBotGUI:
         
         self.backend_status_label = tk.Label(
             status_inner,
-            text="✅ Conectado" if backend_available else "❌ Desconectado",
+            text="⏳ Conectando...",
             font=('Arial', 10),
             bg=self.colors['frame_bg'],
-            fg=self.colors['success'] if backend_available else self.colors['error']
+            fg='gray'
         )
         self.backend_status_label.pack(side=tk.LEFT, padx=(0, 15))
         
@@ -203,7 +533,8 @@ class AutomationBotGUI:
         test_logins_button = tk.Button(
             status_inner,
             text="🔄 Testar Logins",
-            command=self.test_logins,
+            # Clique manual: testa de verdade, ignorando o cache dos testes automáticos
+            command=lambda: self.test_logins(force=True),
             bg=self.colors['info'],
             fg='white',
             font=('Arial', 8),
@@ -295,23 +626,36 @@ class AutomationBotGUI:
         queue_inner = tk.Frame(queue_frame, bg=self.colors['frame_bg'])
         queue_inner.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Listbox com scrollbar
-        listbox_frame = tk.Frame(queue_inner, bg=self.colors['frame_bg'])
-        listbox_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        # Tabela de jobs com scrollbar
+        tree_frame = tk.Frame(queue_inner, bg=self.colors['frame_bg'])
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        scrollbar = tk.Scrollbar(listbox_frame)
+        scrollbar = tk.Scrollbar(tree_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        self.job_listbox = tk.Listbox(
-            listbox_frame,
-            bg=self.colors['entry_bg'],
-            fg=self.colors['fg'],
-            font=('Consolas', 9),
+        self.job_tree = ttk.Treeview(
+            tree_frame,
+            columns=('status', 'url', 'size', 'elapsed'),
+            show='headings',
+            style='Jobs.Treeview',
             yscrollcommand=scrollbar.set,
-            selectmode=tk.SINGLE
+            selectmode='browse'
         )
-        self.job_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.job_listbox.yview)
+        for column, title, width, stretch in (
+            ('status', 'Status', 120, False),
+            ('url', 'Link', 450, True),
+            ('size', 'Tamanho', 90, False),
+            ('elapsed', 'Tempo', 70, False),
+        ):
+            self.job_tree.heading(column, text=title, anchor=tk.W)
+            self.job_tree.column(column, width=width, stretch=stretch, anchor=tk.W)
+        self.job_tree.tag_configure('running', foreground=self.colors['info'])
+        self.job_tree.tag_configure('done', foreground=self.colors['success'])
+        self.job_tree.tag_configure('failed', foreground=self.colors['error'])
+        self.job_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.job_tree.yview)
+        
+        self.job_list = JobListModel(self.root, self.job_tree, on_flush=self.update_queue_count)
         
         queue_buttons_frame = tk.Frame(queue_inner, bg=self.colors['frame_bg'])
         queue_buttons_frame.pack(fill=tk.X)
@@ -411,6 +755,26 @@ class AutomationBotGUI:
         )
         clear_log_button.pack(side=tk.LEFT)
         
+        level_label = tk.Label(
+            logs_buttons_frame,
+            text="Nível:",
+            font=('Arial', 9),
+            bg=self.colors['frame_bg'],
+            fg=self.colors['fg']
+        )
+        level_label.pack(side=tk.LEFT, padx=(15, 5))
+        
+        self.log_level_var = tk.StringVar(value=GUI_LOG_LEVEL if GUI_LOG_LEVEL in LogModel.LEVELS else "INFO")
+        log_level_combo = ttk.Combobox(
+            logs_buttons_frame,
+            textvariable=self.log_level_var,
+            values=list(LogModel.LEVELS),
+            state='readonly',
+            width=9
+        )
+        log_level_combo.bind('<<ComboboxSelected>>', lambda _: self.log_model.set_min_level(self.log_level_var.get()))
+        log_level_combo.pack(side=tk.LEFT)
+        
         self.last_update_label = tk.Label(
             logs_buttons_frame,
             text="",
@@ -433,7 +797,7 @@ class AutomationBotGUI:
         )
         tip_label.pack(side=tk.LEFT)
         
-        exit_button = tk.Button(
+        self.exit_button = tk.Button(
             footer_frame,
             text="❌ Sair",
             command=self.on_closing,
@@ -445,7 +809,7 @@ class AutomationBotGUI:
             padx=15,
             pady=5
         )
-        exit_button.pack(side=tk.RIGHT)
+        self.exit_button.pack(side=tk.RIGHT)
         
         # Bind para fechar janela
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -455,39 +819,76 @@ class AutomationBotGUI:
         return datetime.now().strftime("%H:%M:%S")
     
     def log_message(self, message, level="INFO"):
-        """Adiciona mensagem ao log com timestamp"""
-        timestamp = self.format_timestamp()
-        icons = {
-            "INFO": "ℹ️",
-            "SUCCESS": "✅",
-            "ERROR": "❌",
-            "WARNING": "⚠️"
-        }
-        icon = icons.get(level, "ℹ️")
+        """Adiciona mensagem ao log com timestamp (exibida no próximo flush_logs)"""
+        self.log_model.append(message, level)
+    
+    def flush_logs(self):
+        """Leva ao widget, em um único insert, as linhas novas do log"""
+        reset, lines = self.log_model.take()
+        if reset or lines:
+            # Só acompanha o final se o usuário não rolou para cima
+            at_bottom = self.log_text.yview()[1] >= 0.999
+            self.log_text.config(state=tk.NORMAL)
+            if reset:
+                self.log_text.delete("1.0", tk.END)
+            if lines:
+                self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # Mantém o widget no mesmo limite do buffer
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.log_model.max_lines
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.config(state=tk.DISABLED)
+            if at_bottom or reset:
+                self.log_text.see(tk.END)
+        self.root.after(self.LOG_FLUSH_MS, self.flush_logs)
+    
+    def initialize_logs(self):
+        """Inicializa os logs e começa a conectar o backend em segundo plano"""
+        self.log_message("Conectando ao backend...", "INFO")
+        self.freepik_status_label.config(text="⏳ Aguardando...", fg='gray')
+        self.envato_status_label.config(text="⏳ Aguardando...", fg='gray')
+        self.google_status_label.config(text="⏳ Aguardando...", fg='gray')
         
-        log_text = f"[{timestamp}] {icon} {message}\n"
+        def init_in_thread():
+            init_backend()
+            self.root.after(0, self.on_backend_ready)
         
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, log_text)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        threading.Thread(target=init_in_thread, daemon=True).start()
     
-    def initialize_logs(self):
-        """Inicializa os logs"""
+    def on_first_paint(self):
+        """Chamado quando a janela termina de ser desenhada pela primeira vez"""
+        self.startup_times['first_paint_ms'] = round((time.perf_counter() - STARTUP_T0) * 1000)
+        logging.info(f"Janela exibida em {self.startup_times['first_paint_ms']} ms")
+    
+    def on_backend_ready(self):
+        """Chamado (na thread da GUI) quando a inicialização do backend termina"""
+        self.startup_times['backend_ready_ms'] = round((time.perf_counter() - STARTUP_T0) * 1000)
+        logging.info(f"Backend inicializado em {self.startup_times['backend_ready_ms']} ms")
+        if STARTUP_PROFILE:
+            # Usado por benchmarks/bench_gui_startup.py: imprime as medições e fecha
+            print(json.dumps(self.startup_times), flush=True)
+            self.root.after(0, self.on_closing)
+            return
+        
         if backend_available:
+            self.backend_status_label.config(text="✅ Conectado", fg=self.colors['success'])
             self.log_message("Backend conectado com sucesso!", "SUCCESS")
             self.log_message("Sistema pronto para processar downloads", "INFO")
             # Testar logins automaticamente ao iniciar
             self.test_logins()
         else:
+            self.backend_status_label.config(text="❌ Desconectado", fg=self.colors['error'])
             self.log_message(f"Backend não disponível: {backend_error}", "ERROR")
             self.log_message("Verifique as configurações no arquivo .env", "WARNING")
             self.freepik_status_label.config(text="❌ N/A", fg=self.colors['error'])
             self.envato_status_label.config(text="❌ N/A", fg=self.colors['error'])
             self.google_status_label.config(text="❌ N/A", fg=self.colors['error'])
     
-    def test_logins(self):
-        """Testa os logins do Freepik, Envato e Google Drive"""
+    def test_logins(self, force=False):
+        """Testa os logins do Freepik, Envato e Google Drive (force ignora o cache)"""
+        if not backend_ready.is_set():
+            self.log_message("Backend ainda conectando, aguarde...", "WARNING")
+            return
         if not backend_available:
             messagebox.showerror("Erro", "Backend não disponível!")
             return
@@ -499,7 +900,7 @@ class AutomationBotGUI:
         
         def test_in_thread():
             try:
-                results = asyncio.run(backend_app.test_logins())
+                results = run_backend(backend_app.test_logins(force=force))
                 
                 # Atualizar status do Freepik
                 if results['freepik'] is None:
@@ -567,18 +968,28 @@ class AutomationBotGUI:
         # Executar teste em thread separada para não travar a UI
         threading.Thread(target=test_in_thread, daemon=True).start()
     
+    def restore_pending_jobs(self):
+        """Recarrega na lista os jobs que ainda estavam na fila persistente"""
+        job_store.recover(JOB_QUEUE)
+        pending = job_store.pending(JOB_QUEUE)
+        if pending:
+            for job in pending:
+                self.job_list.add(job['id'], job['url'])
+            self.log_message(f"{len(pending)} link(s) pendente(s) da execução anterior restaurado(s)", "INFO")
+
     def add_links(self):
         """Adiciona links à fila"""
         links_text = self.links_text.get("1.0", tk.END).strip()
         links = [l.strip() for l in links_text.splitlines() if l.strip()]
-        valid_links = [l for l in links if 'freepik.com' in l.lower() or 'envato.com' in l.lower()]
+        # Links normalizados (sem rastreamento/fragmento) e sem repetir o mesmo asset
+        valid_links = find_asset_links(links_text)
         
         if valid_links:
-            for link in valid_links:
-                job_queue.put(link)
-                self.job_list_items.append(f"⏳ {link}")
+            job_ids = job_store.enqueue_many(JOB_QUEUE, valid_links)
+            worker_wakeup.set()
+            for job_id, link in zip(job_ids, valid_links):
+                self.job_list.add(job_id, link)
             
-            self.update_job_list()
             self.links_text.delete("1.0", tk.END)
             self.log_message(f"{len(valid_links)} link(s) adicionado(s) à fila", "SUCCESS")
         else:
@@ -590,19 +1001,21 @@ class AutomationBotGUI:
         """Limpa a área de links"""
         self.links_text.delete("1.0", tk.END)
     
-    def update_job_list(self):
-        """Atualiza a lista de jobs"""
-        self.job_listbox.delete(0, tk.END)
-        for item in self.job_list_items:
-            self.job_listbox.insert(tk.END, item)
-        self.queue_count_label.config(text=f"Jobs na fila: {len(self.job_list_items)}")
+    def update_queue_count(self):
+        """Atualiza o contador de jobs (chamado a cada quadro da lista)"""
+        counts = self.job_list.counts
+        self.queue_count_label.config(
+            text=f"Jobs na fila: {counts['queued']} | Em andamento: {counts['running']}"
+        )
     
     def start_worker(self):
         """Inicia o worker"""
         global worker_thread, worker_running
         
         if not worker_thread or not worker_thread.is_alive():
-            if not backend_available:
+            if not backend_ready.is_set():
+                self.log_message("Backend ainda conectando, aguarde para iniciar o worker", "WARNING")
+            elif not backend_available:
                 self.log_message("Não é possível iniciar: Backend não disponível", "ERROR")
                 messagebox.showerror("Erro", "Backend não disponível!\nVerifique as configurações.")
             else:
@@ -616,50 +1029,87 @@ class AutomationBotGUI:
             self.log_message("Worker já está rodando", "WARNING")
     
     def stop_worker(self):
-        """Para o worker"""
+        """Para de pegar novos jobs; os que estão em andamento terminam normalmente"""
         global worker_running, worker_thread
         
         if worker_thread and worker_thread.is_alive():
             worker_running = False
-            job_queue.put(None)
+            worker_wakeup.set()
             worker_thread.join(timeout=2)
-            self.worker_status_indicator.config(fg=self.colors['error'])
-            self.worker_status_text.config(text="Parado")
-            self.log_message("Worker parado", "INFO")
+            running = self.in_flight_count()
+            if running:
+                self.worker_status_indicator.config(fg=self.colors['warning'])
+                self.worker_status_text.config(text=f"Parando ({running} em andamento)")
+                self.log_message(f"Worker parando: aguardando {running} job(s) em andamento", "INFO")
+                self.wait_drain(self.on_worker_drained)
+            else:
+                self.on_worker_drained()
         else:
             self.log_message("Worker não está rodando", "WARNING")
+
+    def on_worker_drained(self):
+        if worker_running:
+            # O worker foi reiniciado enquanto os jobs terminavam
+            return
+        self.worker_status_indicator.config(fg=self.colors['error'])
+        self.worker_status_text.config(text="Parado")
+        self.log_message("Worker parado", "INFO")
+
+    def in_flight_count(self):
+        with self.in_flight_lock:
+            return len(self.in_flight)
+
+    def wait_drain(self, callback, deadline=None):
+        """
+        Chama `callback` (na thread da GUI) quando não houver mais jobs em andamento,
+        sem travar a interface. Com `deadline`, desiste no horário indicado.
+        """
+        if self.in_flight_count() == 0 or (deadline is not None and time.monotonic() >= deadline):
+            callback()
+        else:
+            self.root.after(200, self.wait_drain, callback, deadline)
     
     def clear_queue(self):
         """Limpa a fila de jobs"""
-        while not job_queue.empty():
-            try:
-                job_queue.get_nowait()
-            except:
-                pass
-        self.job_list_items.clear()
-        self.update_job_list()
+        # Só remove os que aguardam (e os já finalizados da lista);
+        # os que estão em andamento terminam normalmente
+        job_store.clear(JOB_QUEUE)
+        self.job_list.remove_where(('queued', 'done', 'failed'))
         self.log_message("Fila limpa", "INFO")
     
     def clear_logs(self):
         """Limpa os logs"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete("1.0", tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_model.clear()
         self.log_message("Logs limpos", "INFO")
     
-    def process_job(self, job):
-        """Processa um job (download)"""
+    async def process_job(self, job):
+        """Processa um job (download) no event loop do backend"""
+        # Renova a lease enquanto o job roda; se a GUI cair, o job volta para a fila
+        lease = asyncio.create_task(job_store.hold_lease(job['id'], worker_id))
+        try:
+            result = await self._run_job(job['url'])
+        finally:
+            lease.cancel()
+        # Registra o resultado na fila persistente
+        if result['status'] == 'done':
+            job_store.complete(job['id'], result['result'])
+        else:
+            job_store.fail(job['id'], result['result'])
+        return result
+
+    async def _run_job(self, url):
         if not backend_available:
             return {"status": "error", "result": f"Backend não disponível: {backend_error}"}
         
         try:
-            res = asyncio.run(backend_app.process_download_and_upload(job, telegram_message=None))
+            # Submete ao executor do backend, que processa vários jobs em paralelo
+            res = await backend_app.submit_job(url, telegram_message=None)
             
             if res:
                 if isinstance(res, str) and res.startswith('http'):
                     return {"status": "done", "result": f"Link do Drive: {res}"}
                 elif os.path.exists(res):
-                    return {"status": "done", "result": f"Arquivo salvo em: {res}"}
+                    return {"status": "done", "result": f"Arquivo salvo em: {res}", "size": os.path.getsize(res)}
                 else:
                     return {"status": "done", "result": "Processado com sucesso"}
             else:
@@ -667,86 +1117,134 @@ class AutomationBotGUI:
         except Exception as e:
             return {"status": "error", "result": str(e)}
 
+    def on_job_done(self, job, future):
+        """Chamado (na thread do backend) quando um job submetido termina"""
+        with self.in_flight_lock:
+            self.in_flight.pop(future, None)
+        self.in_flight_slots.release()
+        if closing:
+            return
+        try:
+            res = future.result()
+            self.root.after(0, self.job_completed, job, res)
+        except Exception as e:
+            self.root.after(0, self.job_error, job, str(e))
+
     def worker_loop(self):
-        """Loop do worker que processa jobs da fila"""
+        """Loop do worker que submete os jobs da fila ao backend"""
         global worker_running
         
         while worker_running:
+            # Limite de jobs simultâneos: espera uma vaga antes de tirar o próximo da fila
+            if not self.in_flight_slots.acquire(timeout=1):
+                continue
             try:
-                job = job_queue.get(timeout=1)
+                job = job_store.claim(JOB_QUEUE, worker_id) if worker_running else None
                 if job is None:
-                    break
+                    self.in_flight_slots.release()
+                    # Fila vazia: apaga o histórico antigo (no máximo uma vez por hora)
+                    job_store.purge_expired()
+                    if worker_running:
+                        worker_wakeup.wait(timeout=1)
+                        worker_wakeup.clear()
+                    continue
+                url = job['url']
                 
                 # Atualiza UI
-                self.root.after(0, self.update_job_status, job, "processing")
-                self.root.after(0, self.log_message, f"Processando: {job}", "INFO")
-                
-                try:
-                    res = self.process_job(job)
-                    self.root.after(0, self.job_completed, job, res)
-                except Exception as e:
-                    self.root.after(0, self.job_error, job, str(e))
+                self.root.after(0, self.update_job_status, job, "running")
+                self.root.after(0, self.log_message, f"Processando: {url}", "INFO")
                 
-                job_queue.task_done()
-            except queue.Empty:
-                continue
+                # Não aguarda o término: o executor do backend roda os jobs em paralelo
+                future = asyncio.run_coroutine_threadsafe(self.process_job(job), get_backend_loop())
+                with self.in_flight_lock:
+                    self.in_flight[future] = url
+                future.add_done_callback(lambda f, job=job: self.on_job_done(job, f))
             except Exception as e:
                 self.root.after(0, self.log_message, f"Erro no worker: {e}", "ERROR")
-        
-        worker_running = False
-        self.root.after(0, lambda: self.worker_status_indicator.config(fg=self.colors['error']))
-        self.root.after(0, lambda: self.worker_status_text.config(text="Parado"))
+        # O status "Parado" é atualizado por stop_worker quando os jobs em andamento terminam
     
     def update_job_status(self, job, status):
         """Atualiza o status de um job na lista"""
-        for i, item in enumerate(self.job_list_items):
-            if job in item:
-                if status == "processing":
-                    self.job_list_items[i] = f"🔄 {job}"
-                break
-        self.update_job_list()
+        if job['id'] not in self.job_list.jobs:
+            # Job que não estava na lista (ex.: lista limpa enquanto aguardava)
+            self.job_list.add(job['id'], job['url'])
+        self.job_list.set_status(job['id'], status)
     
     def job_completed(self, job, res):
         """Chamado quando um job é concluído"""
-        # Remove da lista
-        self.job_list_items = [item for item in self.job_list_items if job not in item]
-        self.update_job_list()
-        
+        url = job['url']
         if res.get('status') == 'done':
-            self.log_message(f"✅ Concluído: {job}", "SUCCESS")
+            self.job_list.set_status(job['id'], 'done', size=res.get('size'))
+            self.log_message(f"✅ Concluído: {url}", "SUCCESS")
             if res.get('result'):
                 self.log_message(f"   Resultado: {res['result']}", "INFO")
         else:
-            self.log_message(f"❌ Erro: {job}", "ERROR")
+            self.job_list.set_status(job['id'], 'failed')
+            self.log_message(f"❌ Erro: {url}", "ERROR")
             if res.get('result'):
                 self.log_message(f"   Detalhes: {res['result']}", "ERROR")
     
     def job_error(self, job, err):
         """Chamado quando um job tem erro"""
-        self.job_list_items = [item for item in self.job_list_items if job not in item]
-        self.update_job_list()
-        self.log_message(f"❌ Erro ao processar: {job}", "ERROR")
+        self.job_list.set_status(job['id'], 'failed')
+        self.log_message(f"❌ Erro ao processar: {job['url']}", "ERROR")
         self.log_message(f"   Detalhes: {err}", "ERROR")
     
     def update_status(self):
         """Atualiza o status periodicamente"""
         self.last_update_label.config(text=f"Última atualização: {self.format_timestamp()}")
+        self.job_list.refresh_running()
         self.root.after(1000, self.update_status)
     
     def on_closing(self):
         """Chamado quando a janela é fechada"""
         global worker_running, worker_thread
+
+        # Sair durante a espera pelos jobs não pode encerrar (e destruir a janela) duas vezes
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        self.exit_button.config(state=tk.DISABLED)
         
         if worker_thread and worker_thread.is_alive():
             worker_running = False
-            job_queue.put(None)
+            worker_wakeup.set()
             worker_thread.join(timeout=2)
+
+        running = self.in_flight_count()
+        if running:
+            # Dá um tempo para os jobs em andamento terminarem; os que não terminarem
+            # são cancelados e voltam para a fila na próxima execução
+            self.log_message(
+                f"Encerrando: aguardando até {GUI_DRAIN_TIMEOUT}s por {running} job(s) em andamento", "WARNING"
+            )
+            self.root.protocol("WM_DELETE_WINDOW", lambda: None)
+            self.wait_drain(self.finish_closing, deadline=time.monotonic() + GUI_DRAIN_TIMEOUT)
+        else:
+            self.finish_closing()
+
+    def finish_closing(self):
+        global closing
+        closing = True
+        logging.getLogger().removeHandler(self.log_handler)
+        with self.in_flight_lock:
+            pending = list(self.in_flight)
+        for future in pending:
+            future.cancel()
+        
+        # Fecha os navegadores do pool antes de sair
+        shutdown_backend()
         
         self.root.destroy()
 
+# Tempo de import deste módulo (sem o backend, que é carregado depois)
+IMPORT_MS = round((time.perf_counter() - STARTUP_T0) * 1000)
+
 def main():
     root = tk.Tk()
     app = AutomationBotGUI(root)
+    # after_idle roda depois que o Tk processa o desenho inicial da janela
+    root.after_idle(app.on_first_paint)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -15,9 +15,9 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
     try:
-        # Importa e executa o app
+        # Importa e executa o app (o backend é inicializado em segundo plano)
         from frontend import app
-        # O código do app já está no nível do módulo, então não precisa fazer nada mais
+        app.main()
     except Exception as e:
         print(f"Erro ao iniciar a aplicação: {e}")
         print("\nCertifique-se de que:")